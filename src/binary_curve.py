@@ -0,0 +1,145 @@
+'''
+precision-recall and ROC curves of many columns and groups
+'''
+import numpy as np
+import pandas as pd
+
+
+class BinaryCurve:
+    '''
+    scores are sorted once per column, all curves, AUCs and metrics at
+    thresholds come from the cumulative counts of that order.
+    curves are the same as sklearn roc_curve() and precision_recall_curve()
+    '''
+
+    @staticmethod
+    def counts(y, score, presorted:bool=False) -> tuple:
+        '''
+        true and false positives at every distinct score, scores descending
+        '''
+        y = np.asarray(y, dtype=float)
+        score = np.asarray(score, dtype=float)
+        if not presorted:
+            order = np.argsort(score, kind='mergesort')[::-1]
+            y, score = y[order], score[order]
+        last = np.r_[np.flatnonzero(np.diff(score)), len(score) - 1]
+        tps = np.cumsum(y)[last]
+        fps = 1 + last - tps
+        return tps, fps, score[last]
+
+    @staticmethod
+    def roc(tps, fps, thresholds) -> tuple:
+        '''
+        fpr, tpr and thresholds, collinear points are dropped like sklearn
+        '''
+        keep = np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True]
+        tps, fps, thresholds = tps[keep], fps[keep], thresholds[keep]
+        tps, fps = np.r_[0, tps], np.r_[0, fps]
+        thresholds = np.r_[np.inf, thresholds]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return fps / fps[-1], tps / tps[-1], thresholds
+
+    @staticmethod
+    def pr(tps, fps, thresholds) -> tuple:
+        '''
+        precision, recall and increasing thresholds like sklearn
+        '''
+        ps = tps + fps
+        precision = np.where(ps > 0, tps / np.maximum(ps, 1), 0.)
+        recall = tps / tps[-1] if tps[-1] else np.ones(len(tps))
+        return np.r_[precision[::-1], 1.], np.r_[recall[::-1], 0.], thresholds[::-1]
+
+    @staticmethod
+    def auc(x, y) -> float:
+        return float(np.trapezoid(y, x))
+
+    @staticmethod
+    def average_precision(tps, fps) -> float:
+        precision = tps / (tps + fps)
+        recall = tps / tps[-1] if tps[-1] else np.zeros(len(tps))
+        return float(np.sum(np.diff(np.r_[0, recall]) * precision))
+
+    @staticmethod
+    def at(tps, fps, thresholds, cuts) -> dict:
+        '''
+        metrics of predictions with score >= cut, thresholds descending
+        '''
+        # number of distinct scores at or above every cut
+        i = np.searchsorted(-thresholds, -np.asarray(cuts, dtype=float), side='right') - 1
+        tp = np.where(i >= 0, tps[np.maximum(i, 0)], 0)
+        fp = np.where(i >= 0, fps[np.maximum(i, 0)], 0)
+        P, N = tps[-1], fps[-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {'precision': tp / (tp + fp), 'recall': tp / P, 'fpr': fp / N}
+
+    @staticmethod
+    def boot_auc(y, score, n_boot:int=1000, seed:int=0, max_cells:int=1<<20) -> np.ndarray:
+        '''
+        ROC AUC of n_boot resamples, as weights of the distinct scores.
+        AUC = P(score of positive > score of negative) + ties / 2
+        '''
+        y = np.asarray(y, dtype=float)
+        score = np.asarray(score, dtype=float)
+        order = np.argsort(score, kind='mergesort')
+        y, score = y[order], score[order]
+        n = len(y)
+        starts = np.r_[0, np.flatnonzero(np.diff(score)) + 1]
+        rng = np.random.default_rng(seed)
+        res = np.empty(n_boot)
+        step = max(1, max_cells // max(n, 1))
+        for b0 in range(0, n_boot, step):
+            b = min(step, n_boot - b0)
+            # times every row is drawn in every resample
+            idx = rng.integers(0, n, size=(b, n)) + np.arange(b)[:, None] * n
+            w = np.bincount(idx.ravel(), minlength=b * n).reshape(b, n).astype(float)
+            pos = np.add.reduceat(w * y, starts, axis=1)
+            neg = np.add.reduceat(w * (1 - y), starts, axis=1)
+            below = np.cumsum(neg, axis=1) - neg
+            with np.errstate(invalid='ignore', divide='ignore'):
+                res[b0:b0+b] = (pos * (below + neg / 2)).sum(axis=1) / \
+                    (pos.sum(axis=1) * neg.sum(axis=1))
+        return res
+
+    @staticmethod
+    def evaluate(data:dict, cols:list=None, by:str=None, cuts:tuple=(-10, -20),
+            n_boot:int=0, ci:float=.95, seed:int=0) -> pd.DataFrame:
+        '''
+        data: {col: DataFrame with 'y' and col}, such as PlotBinding.data.
+            scores are minus distances of col
+        by: column of subgroups in the frames
+        one row per (col, group): n, positives, roc_auc, average_precision,
+            precision/recall/fpr at every cut, auc_lo and auc_hi if n_boot
+        '''
+        cols = list(data) if cols is None else cols
+        rows = []
+        for col in cols:
+            df = data[col]
+            df = df[df[col].notna()]
+            y = df['y'].to_numpy(dtype=float)
+            score = -df[col].to_numpy(dtype=float)
+            if by is None:
+                codes, keys = np.zeros(len(df), dtype=np.int64), ['all']
+            else:
+                codes, keys = pd.factorize(df[by], sort=True)
+            # one sort per column: groups, then scores descending
+            order = np.lexsort((-score, codes))
+            y, score, codes = y[order], score[order], codes[order]
+            bounds = np.searchsorted(codes, np.arange(len(keys) + 1))
+            for g, key in enumerate(keys):
+                s = slice(bounds[g], bounds[g+1])
+                if s.start == s.stop:
+                    continue
+                tps, fps, thresholds = BinaryCurve.counts(y[s], score[s], presorted=True)
+                fpr, tpr, _ = BinaryCurve.roc(tps, fps, thresholds)
+                row = {'col': col, 'group': key, 'n': s.stop - s.start,
+                    'positives': int(tps[-1]), 'roc_auc': BinaryCurve.auc(fpr, tpr),
+                    'average_precision': BinaryCurve.average_precision(tps, fps)}
+                metrics = BinaryCurve.at(tps, fps, thresholds, cuts)
+                for name, values in metrics.items():
+                    for cut, v in zip(cuts, values):
+                        row[f"{name}@{cut}"] = v
+                if n_boot:
+                    boot = BinaryCurve.boot_auc(y[s], score[s], n_boot, seed + g)
+                    row['auc_lo'], row['auc_hi'] = np.nanquantile(boot, [(1-ci)/2, (1+ci)/2])
+                rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,52 @@
+'''
+reuse database clients across queries and threads
+'''
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+
+    def __init__(self, factory, maxsize:int=4):
+        '''
+        factory: create a client, such as lambda: QueryComplex(True)
+        maxsize: number of clients in use at the same time
+        '''
+        self.factory = factory
+        self.maxsize = maxsize
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(maxsize)
+
+    @contextmanager
+    def connection(self):
+        self.slots.acquire()
+        conn = None
+        try:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+            yield conn
+        except BaseException:
+            # the client may be broken, don't return it to the pool
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.idle.put(conn)
+            self.slots.release()
+
+    def close(self) -> int:
+        '''
+        release idle clients
+        '''
+        n = 0
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                return n
+            if hasattr(conn, 'close'):
+                conn.close()
+            n += 1
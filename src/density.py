@@ -0,0 +1,66 @@
+'''
+scatter plots whose drawing cost does not grow with the number of points
+'''
+import numpy as np
+import seaborn as sns
+from matplotlib.colors import LogNorm
+
+
+class Density:
+    # 'points': one vector marker per point
+    # 'raster': the same markers drawn as one image in vector output
+    # 'hexbin', 'hist2d': counts in bins, log color scale
+    modes = ('points', 'raster', 'hexbin', 'hist2d')
+
+    @staticmethod
+    def bin2d(x, y, bins:int=100, extent:tuple=None) -> tuple:
+        '''
+        counts of points in bins x bins, NaN are skipped
+        extent: (xmin, xmax, ymin, ymax), default range of the data
+        '''
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        keep = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[keep], y[keep]
+        if extent is None:
+            extent = (x.min(), x.max(), y.min(), y.max()) if len(x) else (0, 1, 0, 1)
+        xmin, xmax, ymin, ymax = extent
+        # one value only
+        xmax, ymax = max(xmax, xmin + 1e-9), max(ymax, ymin + 1e-9)
+        counts, xedges, yedges = np.histogram2d(x, y, bins=bins,
+            range=[[xmin, xmax], [ymin, ymax]])
+        return counts, xedges, yedges
+
+    @staticmethod
+    def scatter(ax, df, x:str, y:str, mode:str='points', hue:str=None,
+            bins:int=100, cmap:str='Greys', **kws):
+        '''
+        kws: arguments of sns.scatterplot() in modes 'points' and 'raster'
+        hue is ignored by 'hexbin' and 'hist2d'
+        '''
+        if mode not in Density.modes:
+            raise ValueError(f"mode should be one of {Density.modes}")
+        if mode in ('points', 'raster'):
+            sns.scatterplot(df, x=x, y=y, hue=hue, ax=ax,
+                rasterized=(mode == 'raster'), **kws)
+            return ax
+
+        if mode == 'hexbin':
+            ax.hexbin(df[x], df[y], gridsize=bins // 2, mincnt=1, bins='log',
+                cmap=cmap, linewidths=0)
+        else:
+            counts, xedges, yedges = Density.bin2d(df[x], df[y], bins)
+            counts = np.ma.masked_equal(counts.T, 0)
+            ax.pcolormesh(xedges, yedges, counts, cmap=cmap, rasterized=True,
+                norm=LogNorm(vmin=1, vmax=max(1, counts.max())))
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+        return ax
+
+    @staticmethod
+    def fit_line(ax, x, intercept:float, slope:float, *args, **kws):
+        '''
+        line of a linear fit drawn from min(x) to max(x)
+        '''
+        x = np.asarray(x, dtype=float)
+        ends = np.array([np.nanmin(x), np.nanmax(x)])
+        return ax.plot(ends, intercept + slope * ends, *args, **kws)
@@ -0,0 +1,107 @@
+'''
+distance statistics of many pickles in parallel
+'''
+import os
+import pickle
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from dist_stat import DistStat
+
+
+def read_bytes(path:str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def stat_pickle(data:bytes, row:dict, ranks:tuple, means:tuple) -> pd.DataFrame:
+    '''
+    unpickle one file and calculate statistics, run in worker processes
+    '''
+    records = pickle.loads(data)
+    if isinstance(records, dict):
+        records = [records]
+    meta = []
+    for rec in records:
+        # fields of the database fill missing fields
+        rec = {**row, **rec}
+        meta.append({k: rec.get(k) for k in DistIngest.cols})
+    values, offsets = DistStat.ragged(rec['dist']['value'] for rec in records)
+    stat = DistStat.stat(values, offsets, ranks, means)
+    return pd.concat([pd.DataFrame(meta, columns=DistIngest.cols), stat], axis=1)
+
+
+class DistIngest:
+    cols = ['pdb_id', 'combo_id', 'chain_combo', 'ab_chain_no']
+
+    def __init__(self, data_dir:str, workers:int=None, io_workers:int=8,
+            max_inflight:int=64, verbose:bool=True):
+        '''
+        workers: processes unpickling files, default number of CPUs
+        io_workers: threads reading files
+        max_inflight: files read but not yet processed, bounds memory
+        '''
+        self.data_dir = data_dir
+        self.workers = workers or os.cpu_count()
+        self.io_workers = io_workers
+        self.max_inflight = max_inflight
+        self.verbose = verbose
+        self.errors = []
+
+    def run(self, rows:list, ranks:tuple=None, means:tuple=None) -> pd.DataFrame:
+        '''
+        rows: such as LoadData.distance(table_name)
+        errors of single files are collected in self.errors
+        results are in the order of rows
+        '''
+        self.errors = []
+        res = []
+        total, done = len(rows), 0
+        # progress of every 1%
+        step, shown = max(1, total // 100), -1
+        # positions of rows order the results
+        rows = enumerate(rows)
+        reading, computing = {}, {}
+        # no fork while the IO threads are running
+        ctx = multiprocessing.get_context('spawn')
+        with ThreadPoolExecutor(self.io_workers) as io, \
+            ProcessPoolExecutor(self.workers, mp_context=ctx) as cpu:
+            while True:
+                # keep at most max_inflight files in memory
+                while len(reading) + len(computing) < self.max_inflight:
+                    i, row = next(rows, (None, None))
+                    if row is None:
+                        break
+                    path = os.path.join(self.data_dir, row['relative_pkl'])
+                    reading[io.submit(read_bytes, path)] = (i, row)
+                if not reading and not computing:
+                    break
+
+                finished, _ = wait(list(reading) + list(computing), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in reading:
+                        i, row = reading.pop(future)
+                        try:
+                            data = future.result()
+                        except Exception as e:
+                            self.errors.append((row['relative_pkl'], repr(e)))
+                            done += 1
+                            continue
+                        job = cpu.submit(stat_pickle, data, row, ranks, means)
+                        computing[job] = (i, row)
+                    else:
+                        i, row = computing.pop(future)
+                        try:
+                            res.append((i, future.result()))
+                        except Exception as e:
+                            self.errors.append((row['relative_pkl'], repr(e)))
+                        done += 1
+                if self.verbose and done != shown and (done % step == 0 or done == total):
+                    print(f"\rfiles: {done}/{total}, errors: {len(self.errors)}", end='')
+                    shown = done
+        if self.verbose:
+            print()
+        res = [stat for _, stat in sorted(res, key=lambda x: x[0])]
+        df = pd.concat(res, ignore_index=True) if res else \
+            pd.DataFrame(columns=self.cols)
+        return df
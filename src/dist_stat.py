@@ -0,0 +1,72 @@
+'''
+statistics of the smallest values in ragged distance vectors
+'''
+import numpy as np
+import pandas as pd
+
+
+class DistStat:
+    # rank positions and top-k means in LoadData.abag_dist_stat()
+    ranks = (1, 2, 3, 4, 5, 10)
+    means = (5, 10)
+
+    @staticmethod
+    def ragged(vectors) -> tuple:
+        '''
+        flat values and offsets of vectors
+        '''
+        arrays = [np.asarray(v, dtype=float) for v in vectors]
+        lengths = np.array([len(v) for v in arrays], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        values = np.concatenate(arrays) if arrays else np.zeros(0)
+        return values, offsets
+
+    @staticmethod
+    def smallest(values, offsets, k:int, max_cells:int=1<<22) -> np.ndarray:
+        '''
+        k smallest values of every vector in ascending order, NaN if the
+        vector is shorter than k. Vectors of similar lengths are padded to
+        one matrix, at most max_cells, and partitioned together
+        '''
+        values = np.asarray(values)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        res = np.full((len(lengths), k), np.nan)
+        if len(values) == 0:
+            return res
+
+        # buckets of lengths within a factor of 2
+        bucket = np.ceil(np.log2(np.maximum(lengths, 1))).astype(int)
+        for b in np.unique(bucket[lengths > 0]):
+            segs = np.flatnonzero((bucket == b) & (lengths > 0))
+            width = lengths[segs].max()
+            step = max(1, max_cells // width)
+            for i in range(0, len(segs), step):
+                seg = segs[i:i+step]
+                cols = np.arange(width)
+                pos = offsets[seg, None] + cols[None, :]
+                inside = cols[None, :] < lengths[seg, None]
+                # NaN padding is placed last by partition and sort
+                mat = np.where(inside, values[np.where(inside, pos, 0)], np.nan)
+                kk = min(k, width)
+                if width > kk:
+                    mat = np.partition(mat, kk - 1, axis=1)[:, :kk]
+                res[seg, :kk] = np.sort(mat, axis=1)[:, :kk]
+        return res
+
+    @staticmethod
+    def stat(values, offsets, ranks:tuple=None, means:tuple=None) -> pd.DataFrame:
+        '''
+        columns: '<rank>th' and 'mean<k>th', NaN for short vectors
+        '''
+        ranks = DistStat.ranks if ranks is None else ranks
+        means = DistStat.means if means is None else means
+        k = max(list(ranks) + list(means))
+        top = DistStat.smallest(values, offsets, k)
+        lengths = np.diff(offsets)
+        res = {}
+        for r in ranks:
+            res[f"{r}th"] = top[:, r-1]
+        for m in means:
+            res[f"mean{m}th"] = np.where(lengths >= m, top[:, :m].mean(axis=1), np.nan)
+        return pd.DataFrame(res)
@@ -0,0 +1,129 @@
+'''
+columnar store of distance vectors
+'''
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from query_cache import find_frame, read_frame, write_frame
+
+
+class DistanceStore:
+    '''
+    distance vectors of all records in one flat float32 array.
+    vector i is values[offsets[i]:offsets[i+1]]
+    files in store_dir:
+        values.f32: raw float32, memory-mapped
+        labels.i64: raw int64 index of the vectors, if integers
+        offsets.npy: int64, number of records + 1
+        meta.parquet or meta.pkl.gz: one row per record
+    '''
+
+    def __init__(self, store_dir:str, mmap:bool=True):
+        self.store_dir = store_dir
+        self.offsets = np.load(os.path.join(store_dir, 'offsets.npy'))
+        self.meta = read_frame(find_frame(os.path.join(store_dir, 'meta')))
+        self.values = self.load_array('values.f32', np.float32, mmap)
+        self.labels = None
+        if os.path.isfile(os.path.join(store_dir, 'labels.i64')):
+            self.labels = self.load_array('labels.i64', np.int64, mmap)
+
+    def load_array(self, name:str, dtype, mmap:bool) -> np.ndarray:
+        path = os.path.join(self.store_dir, name)
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        if mmap:
+            return np.memmap(path, dtype=dtype, mode='r')
+        return np.fromfile(path, dtype=dtype)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i:int) -> np.ndarray:
+        return self.values[self.offsets[i]:self.offsets[i+1]]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def vector(self, i:int) -> pd.Series:
+        '''
+        same as row['dist']['value'] of the pickled record
+        '''
+        start, end = self.offsets[i], self.offsets[i+1]
+        index = None if self.labels is None else self.labels[start:end]
+        return pd.Series(self.values[start:end], index=index)
+
+    def find(self, **kwargs) -> np.ndarray:
+        '''
+        positions of records, such as find(combo_id=12)
+        '''
+        mask = np.ones(len(self), dtype=bool)
+        for col, value in kwargs.items():
+            mask &= (self.meta[col] == value).to_numpy()
+        return np.flatnonzero(mask)
+
+    def records(self):
+        '''
+        yield records like those of the pickle
+        '''
+        for i, row in enumerate(self.meta.to_dict('records')):
+            row['dist'] = {'value': self.vector(i)}
+            yield row
+
+    @staticmethod
+    def read_pickles(pfiles:list, verbose:bool=False):
+        '''
+        yield records from pickles of one record or a list of records
+        '''
+        for pfile in pfiles:
+            with open(pfile, 'rb') as f:
+                data = pickle.load(f)
+            if verbose:
+                print(pfile)
+            if isinstance(data, dict):
+                data = [data]
+            for row in data:
+                yield row
+
+    @staticmethod
+    def write(records, store_dir:str) -> 'DistanceStore':
+        '''
+        records: iterable of dict with 'dist': {'value': Series}
+        other scalar fields are saved in meta.
+        vectors are appended to disk one at a time
+        '''
+        os.makedirs(store_dir, exist_ok=True)
+        offsets, meta = [0], []
+        with_labels = True
+        values_file = open(os.path.join(store_dir, 'values.f32'), 'wb')
+        labels_file = open(os.path.join(store_dir, 'labels.i64'), 'wb')
+        with values_file, labels_file:
+            for row in records:
+                dist = row['dist']['value']
+                values = np.asarray(dist, dtype=np.float32)
+                values_file.write(values.tobytes())
+                index = getattr(dist, 'index', None)
+                if with_labels and index is not None \
+                    and pd.api.types.is_integer_dtype(index.dtype):
+                    labels_file.write(np.asarray(index, dtype=np.int64).tobytes())
+                else:
+                    with_labels = False
+                offsets.append(offsets[-1] + len(values))
+                meta.append({k: v for k, v in row.items() \
+                    if k != 'dist' and np.isscalar(v)})
+        if not with_labels:
+            os.remove(os.path.join(store_dir, 'labels.i64'))
+        np.save(os.path.join(store_dir, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+        write_frame(os.path.join(store_dir, 'meta'), pd.DataFrame(meta))
+        print('records:', len(meta), 'distances:', offsets[-1])
+        return DistanceStore(store_dir)
+
+    @staticmethod
+    def convert(pfiles, store_dir:str) -> 'DistanceStore':
+        '''
+        pfiles: one pickle or many, such as relative_pkl of LoadData.distance()
+        '''
+        if isinstance(pfiles, str):
+            pfiles = [pfiles]
+        return DistanceStore.write(DistanceStore.read_pickles(pfiles), store_dir)
@@ -0,0 +1,92 @@
+'''
+dictionary-encoded identifiers and compact numeric columns
+'''
+import threading
+import pandas as pd
+
+
+class CodeBook:
+
+    def __init__(self, cols:list):
+        '''
+        one global dictionary per column in cols. Frames encoded by the same
+        CodeBook share categories, so merges on these columns run on codes
+        '''
+        self.cols = list(cols)
+        self.categories = {}
+        self.lock = threading.Lock()
+
+    def update(self, col:str, values) -> pd.Index:
+        '''
+        append new values, codes of known values never change
+        '''
+        with self.lock:
+            cats = self.categories.get(col)
+            uniques = pd.Index(pd.unique(values)).dropna()
+            if cats is None:
+                cats = uniques.sort_values()
+            else:
+                new = uniques.difference(cats)
+                if len(new):
+                    cats = cats.append(new.sort_values())
+            self.categories[col] = cats
+            return cats
+
+    def encode(self, df:pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        for col in self.cols:
+            if col not in df:
+                continue
+            s = df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                cats = self.update(col, s.cat.categories)
+                df[col] = s.cat.set_categories(cats)
+            else:
+                cats = self.update(col, s)
+                df[col] = pd.Categorical(s, categories=cats)
+        return df
+
+    def align(self, *frames) -> tuple:
+        '''
+        catch up with categories added after the frames were encoded
+        '''
+        res = []
+        for df in frames:
+            df = df.copy(deep=False)
+            for col in self.cols:
+                if col in df and isinstance(df[col].dtype, pd.CategoricalDtype) \
+                    and col in self.categories:
+                    cats = self.categories[col]
+                    if len(df[col].cat.categories) != len(cats):
+                        df[col] = df[col].cat.set_categories(cats)
+            res.append(df)
+        return tuple(res)
+
+    @staticmethod
+    def downcast(df:pd.DataFrame) -> pd.DataFrame:
+        '''
+        float64 to float32, integers to the smallest type
+        '''
+        df = df.copy(deep=False)
+        for col in df.select_dtypes('float64').columns:
+            df[col] = df[col].astype('float32')
+        for col in df.select_dtypes('integer').columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        return df
+
+    def compact(self, df:pd.DataFrame) -> pd.DataFrame:
+        return self.downcast(self.encode(df))
+
+    @staticmethod
+    def observed(df:pd.DataFrame) -> pd.DataFrame:
+        '''
+        drop categories without rows, such as global categories in subsets
+        of compact frames, before value_counts() or seaborn hue and axes
+        '''
+        cols = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+        if not cols:
+            return df
+        df = df.copy(deep=False)
+        for col in cols:
+            df[col] = df[col].cat.remove_unused_categories()
+        return df
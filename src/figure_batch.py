@@ -0,0 +1,198 @@
+'''
+render many figures in parallel processes
+
+a figure is declared by a dict:
+    {
+        'name': 'fig_heavy_gene',       # output file name without extension
+        'args': {'width_level': 3, 'height': 7, 'width_ratios': [2, 1]},
+        'layout': 'row',                # method of Layout
+        'layout_args': [(-5, -20), 10],
+        'panels': [
+            {'plot': 'PlotSeq', 'data': 'antibody', 'method': 'pie_specie_chain',
+                'args': ['Homo sapiens', 'Heavy', 'gene_name', 5, {}]},
+            {'plot': 'PlotSeq', 'data': 'antibody', 'method': 'table_specie_chain',
+                'args': ['Homo sapiens', 'Heavy', 'gene_name', 5]},
+        ],
+    }
+panel i is drawn on the i-th axes. 'data' is the name of a shared frame,
+without 'data' the method is called on the class, such as PlotVenn.
+a figure is rendered again only if its spec, one of its frames or the
+source of its plot classes and Layout changed; bump FigureBatch.version
+after editing other drawing code, such as density.py. panel data is cached
+apart from drawing by PanelCache
+'''
+import importlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from shared_frames import SharedFrames
+from panel_cache import PanelCache
+
+# state of worker processes
+_frames = {}
+_plots = {}
+
+
+def init_worker(share_dir:str):
+    # matplotlib is not thread-safe, every process has its own state
+    import matplotlib
+    matplotlib.use('Agg')
+    _frames.update(SharedFrames(share_dir).read_all())
+
+
+def plot_class(name:str):
+    '''
+    such as PlotSeq in plot_seq.py
+    '''
+    module = re.sub(r'(?<!^)([A-Z])', r'_\1', name).lower()
+    return getattr(importlib.import_module(module), name)
+
+
+def plot_object(name:str, data:str):
+    '''
+    one object per (class, frame) and process, so caches of PlotSeq are reused
+    '''
+    key = (name, data)
+    if key not in _plots:
+        _plots[key] = plot_class(name)(_frames[data], verbose=False)
+    return _plots[key]
+
+
+def figure_path(spec:dict, outdir:str) -> str:
+    return os.path.join(outdir, f"{spec['name']}.{spec.get('format', 'tif')}")
+
+
+def render_figure(spec:dict, outdir:str) -> str:
+    import matplotlib.pyplot as plt
+    from layout import Layout
+
+    layout = Layout(spec.get('args', {}))
+    fig, axes = getattr(layout, spec.get('layout', 'one'))(*spec.get('layout_args', []))
+    if not isinstance(axes, (tuple, list)):
+        axes = (axes,)
+    try:
+        for ax, panel in zip(axes, spec.get('panels', [])):
+            if 'data' in panel:
+                obj = plot_object(panel['plot'], panel['data'])
+            else:
+                obj = plot_class(panel['plot'])
+            args = list(panel.get('args', []))
+            # ax is the first argument except PlotVenn.venn_chain()
+            args.insert(panel.get('ax_pos', 0), ax)
+            getattr(obj, panel['method'])(*args, **panel.get('kwargs', {}))
+        path = figure_path(spec, outdir)
+        fig.savefig(path, dpi=spec.get('dpi', 600), bbox_inches='tight', pad_inches=.05)
+    finally:
+        plt.close(fig)
+    return path
+
+
+class FigureBatch:
+    # fingerprints of rendered figures in outdir
+    manifest_name = 'figure_batch.json'
+    # bump to render all figures again
+    version = 1
+
+    def __init__(self, frames:dict, outdir:str, workers:int=None,
+            share_dir:str=None, verbose:bool=True):
+        '''
+        frames: {name: DataFrame}, such as {'antibody': LoadData.antibody()}
+        workers: processes, default number of CPUs
+        share_dir: memory-mapped frames, default a temporary directory
+        '''
+        self.frames = frames
+        self.outdir = outdir
+        self.workers = workers or os.cpu_count()
+        self.share_dir = share_dir
+        self.verbose = verbose
+        self.errors = []
+
+    def fingerprints(self, specs:list) -> dict:
+        '''
+        {name: fingerprint of the spec, the frames of its panels and the
+        drawing code}
+        '''
+        from layout import Layout
+        frames = {}
+        res = {}
+        for spec in specs:
+            panels = spec.get('panels', [])
+            data = sorted({p['data'] for p in panels if 'data' in p})
+            for name in data:
+                if name not in frames:
+                    frames[name] = PanelCache.fingerprint(self.frames[name])
+            code = PanelCache.source(Layout, *[plot_class(p['plot']) for p in panels])
+            res[spec['name']] = PanelCache.fingerprint(self.version, spec, code,
+                [frames[n] for n in data])
+        return res
+
+    def load_manifest(self) -> dict:
+        path = os.path.join(self.outdir, self.manifest_name)
+        if not os.path.isfile(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest:dict):
+        path = os.path.join(self.outdir, self.manifest_name)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def run(self, specs:list, force:bool=False) -> dict:
+        '''
+        return {name: path of figure}
+        force: render all figures, otherwise only changed figures
+        errors of single figures are collected in self.errors
+        '''
+        self.errors = []
+        os.makedirs(self.outdir, exist_ok=True)
+        fingerprints = self.fingerprints(specs)
+        manifest = {} if force else self.load_manifest()
+        res, todo = {}, []
+        for spec in specs:
+            path = figure_path(spec, self.outdir)
+            if manifest.get(spec['name']) == fingerprints[spec['name']] \
+                and os.path.isfile(path):
+                res[spec['name']] = path
+            else:
+                todo.append(spec)
+        if self.verbose:
+            print(f"figures: {len(todo)} to render, {len(res)} unchanged")
+        if not todo:
+            return res
+
+        share_dir = self.share_dir or tempfile.mkdtemp(prefix='figure_batch_')
+        SharedFrames.share(self.frames, share_dir)
+        # spawn: forked copies of a notebook's matplotlib state are unsafe
+        ctx = multiprocessing.get_context('spawn')
+        workers = max(1, min(self.workers, len(todo)))
+        done = 0
+        try:
+            with ProcessPoolExecutor(workers, mp_context=ctx, \
+                initializer=init_worker, initargs=(share_dir,)) as pool:
+                jobs = {pool.submit(render_figure, spec, self.outdir): spec['name'] \
+                    for spec in todo}
+                for future in as_completed(jobs):
+                    name = jobs[future]
+                    done += 1
+                    try:
+                        res[name] = future.result()
+                        manifest[name] = fingerprints[name]
+                    except Exception as e:
+                        manifest.pop(name, None)
+                        self.errors.append((name, repr(e)))
+                    if self.verbose:
+                        print(f"\rfigures: {done}/{len(todo)}, " + \
+                            f"errors: {len(self.errors)}", end='')
+        finally:
+            self.save_manifest(manifest)
+            if self.share_dir is None:
+                shutil.rmtree(share_dir, ignore_errors=True)
+        if self.verbose:
+            print()
+        return res
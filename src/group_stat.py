@@ -0,0 +1,150 @@
+'''
+linear regression, correlations and quantiles of many groups in one pass
+'''
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+
+class GroupStat:
+    # statistics with bootstrap confidence intervals
+    boot_cols = ('slope', 'intercept', 'r2', 'pearson', 'q1', 'q2')
+
+    @staticmethod
+    def codes(df:pd.DataFrame, by=None) -> tuple:
+        '''
+        group number of every row, -1 for missing keys, and the group keys
+        '''
+        if by is None:
+            return np.zeros(len(df), dtype=np.int64), pd.Index(['all'])
+        if isinstance(by, str):
+            codes, keys = pd.factorize(df[by], sort=True)
+            return codes, pd.Index(keys, name=by)
+        keys = pd.MultiIndex.from_frame(df[list(by)])
+        codes, keys = keys.factorize(sort=True)
+        return codes, keys
+
+    @staticmethod
+    def moments(x, y, codes, n_groups:int) -> dict:
+        '''
+        counts, means, variances and covariance of every group
+        '''
+        n = np.bincount(codes, minlength=n_groups).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mx = np.bincount(codes, x, n_groups) / n
+            my = np.bincount(codes, y, n_groups) / n
+            # centered sums are stable for large values
+            dx, dy = x - mx[codes], y - my[codes]
+            sxx = np.bincount(codes, dx * dx, n_groups)
+            syy = np.bincount(codes, dy * dy, n_groups)
+            sxy = np.bincount(codes, dx * dy, n_groups)
+        return {'n': n, 'mx': mx, 'my': my, 'sxx': sxx, 'syy': syy, 'sxy': sxy}
+
+    @staticmethod
+    def linear(m:dict) -> dict:
+        '''
+        least squares of y on x and pearson correlation from moments
+        '''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = m['sxy'] / m['sxx']
+            r = m['sxy'] / np.sqrt(m['sxx'] * m['syy'])
+        return {'slope': slope, 'intercept': m['my'] - slope * m['mx'], 'pearson': r}
+
+    @staticmethod
+    def pvalue(r, n) -> np.ndarray:
+        '''
+        two-sided p-value of pearson r, same as scipy.stats.pearsonr
+        '''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            df = n - 2
+            t = r * np.sqrt(df / np.maximum(1 - r * r, 0))
+            return np.where(df > 0, 2 * t_dist.sf(np.abs(t), df), np.nan)
+
+    @staticmethod
+    def quantiles(x, codes, n_groups:int, q:float) -> np.ndarray:
+        '''
+        q quantile of every group, linear interpolation like np.quantile
+        '''
+        order = np.lexsort((x, codes))
+        xs = x[order]
+        n = np.bincount(codes, minlength=n_groups)
+        starts = np.concatenate([[0], np.cumsum(n)[:-1]])
+        h = (n - 1) * q
+        lo = np.floor(h).astype(np.int64)
+        hi = np.minimum(lo + 1, n - 1)
+        found = n > 0
+        lo_val = xs[np.where(found, starts + lo, 0)] if len(xs) else np.zeros(n_groups)
+        hi_val = xs[np.where(found, starts + hi, 0)] if len(xs) else np.zeros(n_groups)
+        return np.where(found, lo_val + (h - lo) * (hi_val - lo_val), np.nan)
+
+    @staticmethod
+    def bootstrap(x, y, q:float, n_boot:int, seed:int=0, max_cells:int=1<<20) -> np.ndarray:
+        '''
+        statistics of GroupStat.boot_cols in n_boot resamples of one group.
+        resamples are index matrices of at most max_cells, not loops.
+        one batch holds about 8 arrays of max_cells, 64 MB by default
+        '''
+        rng = np.random.default_rng(seed)
+        n = len(x)
+        res = np.full((n_boot, len(GroupStat.boot_cols)), np.nan)
+        if n < 3:
+            return res
+        step = max(1, max_cells // n)
+        for i in range(0, n_boot, step):
+            b = min(step, n_boot - i)
+            idx = rng.integers(0, n, size=(b, n))
+            xb, yb = x[idx], y[idx]
+            mx, my = xb.mean(axis=1), yb.mean(axis=1)
+            dx, dy = xb - mx[:, None], yb - my[:, None]
+            sxx, syy = (dx * dx).sum(axis=1), (dy * dy).sum(axis=1)
+            sxy = (dx * dy).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                slope = sxy / sxx
+                r = sxy / np.sqrt(sxx * syy)
+            res[i:i+b] = np.column_stack([slope, my - slope * mx, r * r, r,
+                np.quantile(xb, 1-q, axis=1), np.quantile(yb, q, axis=1)])
+        return res
+
+    @staticmethod
+    def regress(df:pd.DataFrame, col1:str, col2:str, by=None, q:float=.95,
+            n_boot:int=0, ci:float=.95, seed:int=0) -> pd.DataFrame:
+        '''
+        one row per group of by, such as 'chain_type' or ['specie', 'chain_type']
+        columns: n, slope, intercept, r2, pearson, pvalue, spearman,
+            q1: 1-q quantile of col1, q2: q quantile of col2,
+            <stat>_lo and <stat>_hi: bootstrap interval of ci if n_boot > 0
+        '''
+        codes, keys = GroupStat.codes(df, by)
+        x = df[col1].to_numpy(dtype=float)
+        y = df[col2].to_numpy(dtype=float)
+        keep = (codes >= 0) & ~np.isnan(x) & ~np.isnan(y)
+        codes, x, y = codes[keep], x[keep], y[keep]
+        k = len(keys)
+
+        m = GroupStat.moments(x, y, codes, k)
+        res = {'n': m['n'].astype(int), **GroupStat.linear(m)}
+        res['r2'] = res['pearson'] ** 2
+        res['pvalue'] = GroupStat.pvalue(res['pearson'], m['n'])
+        # spearman: pearson of ranks within groups
+        rx = pd.Series(x).groupby(codes).rank().to_numpy()
+        ry = pd.Series(y).groupby(codes).rank().to_numpy()
+        res['spearman'] = GroupStat.linear(GroupStat.moments(rx, ry, codes, k))['pearson']
+        res['q1'] = GroupStat.quantiles(x, codes, k, 1-q)
+        res['q2'] = GroupStat.quantiles(y, codes, k, q)
+        stat = pd.DataFrame(res, index=keys)
+        stat = stat[['n', 'slope', 'intercept', 'r2', 'pearson', 'pvalue', 'spearman', 'q1', 'q2']]
+
+        if n_boot:
+            order = np.argsort(codes, kind='stable')
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=k))])
+            lo, hi = np.empty((k, len(GroupStat.boot_cols))), np.empty((k, len(GroupStat.boot_cols)))
+            for g in range(k):
+                rows = order[bounds[g]:bounds[g+1]]
+                boot = GroupStat.bootstrap(x[rows], y[rows], q, n_boot, seed + g)
+                with np.errstate(invalid='ignore'):
+                    lo[g] = np.nanquantile(boot, (1-ci)/2, axis=0) if len(rows) >= 3 else np.nan
+                    hi[g] = np.nanquantile(boot, (1+ci)/2, axis=0) if len(rows) >= 3 else np.nan
+            for j, col in enumerate(GroupStat.boot_cols):
+                stat[f"{col}_lo"] = lo[:, j]
+                stat[f"{col}_hi"] = hi[:, j]
+        return stat
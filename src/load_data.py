@@ -1,20 +1,333 @@
+import hashlib
 import numpy as np
 import pandas as pd
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 src_dir = os.path.dirname(os.getcwd())
-bioomics_dir = '/home/yuan/bio/bio_omics/src'
+bioomics_dir = os.environ.get('BIOOMICS_DIR', '/home/yuan/bio/bio_omics/src')
 for _dir in (src_dir, bioomics_dir):
     if _dir not in sys.path:
         sys.path.append(_dir)
 
-from bioomics import QueryComplex, ProcessPickle
+try:
+    from bioomics import QueryComplex
+except ImportError:
+    # offline: LoadData.use_backend('duckdb')
+    QueryComplex = None
+from query_cache import QueryCache, MemoryCache, default_dir, write_frame
+from connection_pool import ConnectionPool
+from snapshot import Snapshot
+from local_backend import LocalBackend
+from encoding import CodeBook
+from region_index import RegionIndex
+from dist_store import DistanceStore
+from dist_stat import DistStat
+from dist_ingest import DistIngest
+from quantile_sketch import QuantileSketch
 
 class LoadData:
+    # on-disk cache of query results. None: always query the database
+    cache = QueryCache()
+    # shared tables in memory, such as antibody()
+    memo = MemoryCache(maxsize=8, ttl=None)
+    memo_lock = threading.RLock()
+    # 'bioomics': QueryComplex, 'duckdb': LocalBackend of data_dir
+    backends = ('bioomics', 'duckdb')
+    backend = os.environ.get('PREDICT_ANTIBODY_BACKEND', 'bioomics')
+    # default: snapshots in the cache directory
+    data_dir = os.environ.get('PREDICT_ANTIBODY_DATA')
+    # database clients shared by queries
+    pool = ConnectionPool(lambda: LoadData.connect(), maxsize=4)
+    # tables refreshed by incremental(): {table: (key, watermark)}
+    snapshots = {
+        'view_antibody': (['chain_id'], 'release_date'),
+    }
+    # antibody() reads view_antibody from its snapshot
+    use_snapshots = False
+    # categorical identifiers from one global dictionary, float32 numbers
+    compact = False
+    codebook = CodeBook(['pdb_id', 'chain_id', 'combo_id', 'chain_type',
+        'specie', 'gene_name', 'allele_name', 'structure_method'])
+    # binding columns: (SQL expression, condition of valid rows).
+    # ln() is only evaluated on rows passing the condition
+    binding_cols = {
+        'binding_affinity': ('binding_affinity', 'binding_affinity is not null'),
+        'log-kd': ('ln(dissociation_constant)', 'dissociation_constant > 0'),
+    }
 
     @staticmethod
-    def antibody():
+    def snapshot_dir() -> str:
+        cache_dir = LoadData.cache.cache_dir if LoadData.cache else default_dir()
+        return os.path.join(cache_dir, 'snapshots')
+
+    @staticmethod
+    def connect():
+        '''
+        new client of the selected backend
+        '''
+        if LoadData.backend == 'bioomics':
+            if QueryComplex is None:
+                raise ImportError("bioomics is not found. Set BIOOMICS_DIR, " + \
+                    "or use a local backend: LoadData.use_backend('duckdb')")
+            return QueryComplex(True)
+        data_dir = LoadData.data_dir or LoadData.snapshot_dir()
+        return LocalBackend(data_dir)
+
+    @staticmethod
+    def use_backend(backend:str, data_dir:str=None):
+        '''
+        backend: 'bioomics' or 'duckdb'
+        '''
+        if backend not in LoadData.backends:
+            raise ValueError(f"backend should be one of {LoadData.backends}")
+        LoadData.backend = backend
+        LoadData.data_dir = data_dir
+        # idle clients of the previous backend
+        LoadData.pool.close()
+        LoadData.memo.refresh()
+
+    @staticmethod
+    def export_tables(tables:list) -> list:
+        '''
+        save tables or views of the current backend for a local backend
+        '''
+        data_dir = LoadData.data_dir or LoadData.snapshot_dir()
+        os.makedirs(data_dir, exist_ok=True)
+        paths = []
+        for table in tables:
+            df = LoadData.fetch(f"select * from {table};")
+            paths.append(write_frame(os.path.join(data_dir, table), df))
+            print(table, df.shape)
+        return paths
+
+    @staticmethod
+    def fetch(sql:str, tables:dict=None) -> pd.DataFrame:
+        '''
+        query the database, bypassing the cache
+        tables: {name: DataFrame} joined by sql at the placeholder {name},
+            such as a set of combo_id. duckdb registers the DataFrame,
+            other clients get the rows inline as (values ...)
+        '''
+        tables = tables or {}
+        with LoadData.pool.connection() as conn:
+            registered = hasattr(conn, 'register')
+            for name, df in tables.items():
+                if registered:
+                    conn.register(name, df)
+                    source = name
+                else:
+                    source = LoadData.values_sql(name, df)
+                sql = sql.replace('{' + name + '}', source)
+            try:
+                return conn.list_data(sql, True)
+            finally:
+                if registered:
+                    for name in tables:
+                        conn.unregister(name)
+
+    @staticmethod
+    def literal(value) -> str:
+        '''
+        SQL literal of one value
+        '''
+        if value is None or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+            return 'null'
+        if isinstance(value, (bool, np.bool_)):
+            return 'true' if value else 'false'
+        if isinstance(value, (int, np.integer)):
+            return str(int(value))
+        if isinstance(value, (float, np.floating)):
+            return repr(float(value))
+        return "'" + str(value).replace("'", "''") + "'"
+
+    @staticmethod
+    def values_sql(name:str, df:pd.DataFrame) -> str:
+        '''
+        rows of df as a derived table, such as (values (1), (2)) as T(combo_id)
+        '''
+        cols = ', '.join(df.columns)
+        if len(df) == 0:
+            nulls = ', '.join(f"null as {col}" for col in df.columns)
+            return f"(select {nulls} where 1 = 0) as {name}"
+        rows = ', '.join('(' + ', '.join(LoadData.literal(v) for v in row) + ')' \
+            for row in df.itertuples(index=False))
+        return f"(values {rows}) as {name}({cols})"
+
+    @staticmethod
+    def table_key(tables:dict) -> dict:
+        '''
+        fingerprints of joined tables in cache keys
+        '''
+        return {name: hashlib.sha1(pd.util.hash_pandas_object(df, index=False) \
+            .to_numpy().tobytes()).hexdigest() for name, df in tables.items()}
+
+    @staticmethod
+    def encode(df:pd.DataFrame) -> pd.DataFrame:
+        return LoadData.codebook.compact(df) if LoadData.compact else df
+
+    @staticmethod
+    def merge(left:pd.DataFrame, right:pd.DataFrame, **kwargs) -> pd.DataFrame:
+        '''
+        pd.merge() of frames sharing the categories of LoadData.codebook
+        '''
+        left, right = LoadData.codebook.align(left, right)
+        return pd.merge(left, right, **kwargs)
+
+    @staticmethod
+    def query(query:str, params:dict=None, refresh:bool=False, tables:dict=None,
+            encode:bool=True) -> pd.DataFrame:
+        '''
+        params fill placeholders in query, such as {table_name}
+        refresh: ignore cached results
+        tables: {name: DataFrame} joined by query, see LoadData.fetch()
+        encode: LoadData.encode() the result, False for raw values
+        '''
+        cache = LoadData.cache
+        key = LoadData.cache_key(params, tables)
+        if cache is not None and not refresh:
+            df = cache.get(query, key)
+            if df is not None:
+                return LoadData.encode(df) if encode else df
+        sql = query.format(**params) if params else query
+        df = LoadData.fetch(sql, tables)
+        if cache is not None:
+            cache.put(query, df, key)
+        return LoadData.encode(df) if encode else df
+
+    @staticmethod
+    def cache_key(params:dict=None, tables:dict=None) -> dict:
+        '''
+        params of the cache entry of query()
+        '''
+        key = {'params': params, 'backend': LoadData.backend}
+        if LoadData.backend != 'bioomics':
+            # local backends over different directories hold different rows
+            data_dir = LoadData.data_dir or LoadData.snapshot_dir()
+            key['data_dir'] = os.path.abspath(data_dir)
+        if tables:
+            key['tables'] = LoadData.table_key(tables)
+        return key
+
+    @staticmethod
+    def invalidate(query:str=None, params:dict=None, tables:dict=None) -> int:
+        '''
+        remove the cached result of query() with the same arguments,
+        all cached results if query is None
+        '''
+        if LoadData.cache is None:
+            return 0
+        if query is None:
+            return LoadData.cache.clear()
+        return LoadData.cache.invalidate(query, LoadData.cache_key(params, tables))
+
+    @staticmethod
+    def query_chunks(query:str, params:dict=None, chunksize:int=100000, key=None,
+            tables:dict=None):
+        '''
+        yield DataFrames of at most chunksize rows, bypassing the cache.
+        key: columns of a unique, non-null key, such as 'combo_id' or
+            ['pdb_id', 'combo_id', 'relative_pkl']. Pages are ordered by key
+            and start after the last key of the previous page, so every page
+            is an index range scan, not a rescan like offset
+        '''
+        if key is None:
+            raise ValueError("query_chunks() needs the columns of a unique key")
+        key = [k.strip() for k in key.split(',')] if isinstance(key, str) else list(key)
+        sql = query.format(**params) if params else query
+        sql = sql.strip().rstrip(';')
+        cols, order = ', '.join(f"Q.{k}" for k in key), ', '.join(key)
+        last = None
+        while True:
+            page = f"select * from ({sql}) Q"
+            if last is not None:
+                values = ', '.join(LoadData.literal(v) for v in last)
+                page += f" where ({cols}) > ({values})"
+            page += f" order by {order} limit {chunksize};"
+            # don't hold a client while the caller consumes the chunk
+            df = LoadData.fetch(page, tables)
+            if len(df) == 0:
+                return
+            last = df[key].iloc[-1].tolist()
+            yield LoadData.encode(df)
+            if len(df) < chunksize:
+                return
+
+    @staticmethod
+    def sketch(query:str, cols:list, params:dict=None, chunksize:int=100000,
+            key=None, k:int=1000, tables:dict=None) -> dict:
+        '''
+        {col: QuantileSketch} of numeric columns, one chunk in memory at a time
+        key: unique key of query, see query_chunks()
+        '''
+        sketches = {col: QuantileSketch(k) for col in cols}
+        for df in LoadData.query_chunks(query, params, chunksize, key, tables):
+            for col in cols:
+                sketches[col].update(df[col])
+        return sketches
+
+    @staticmethod
+    def incremental(table:str, key=None, watermark:str=None, full:bool=False,
+            encode:bool=True) -> pd.DataFrame:
+        '''
+        local snapshot of a table. Only rows at or after the high-water mark
+        are fetched and upserted by key. key and watermark default to
+        LoadData.snapshots. Rows deleted in the database or without
+        watermark are not updated until full=True
+        '''
+        if key is None:
+            key, watermark = LoadData.snapshots[table]
+        snap = Snapshot(table, key, watermark, LoadData.snapshot_dir())
+        df, mark = (None, None) if full else snap.load()
+        if df is None or mark is None:
+            df = None
+            sql = f"select * from {table};"
+        else:
+            # rows on the mark may arrive after the last refresh
+            sql = f"select * from {table} where {watermark} >= '{mark}';"
+        new = LoadData.fetch(sql)
+        df = snap.merge(df, new)
+        snap.save(df)
+        print(f"{table}, fetched rows: {len(new)}, snapshot rows: {len(df)}")
+        return LoadData.encode(df) if encode else df
+
+    @staticmethod
+    def load_many(tasks:dict, max_workers:int=4) -> dict:
+        '''
+        run independent loaders concurrently
+        tasks: {name: SQL, loader or (loader, *args)}
+        example: {
+            'afsum': LoadData.chain_afsum,
+            'contacts': (LoadData.combo2_contacts, ab_combo2),
+            'rmsd': 'select * from chain_rmsd;',
+        }
+        '''
+        def run(task):
+            if isinstance(task, str):
+                return LoadData.query(task)
+            if isinstance(task, tuple):
+                func, *args = task
+                return func(*args)
+            return task()
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = {name: executor.submit(run, task) for name, task in tasks.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    @staticmethod
+    def refresh(name:str=None) -> int:
+        '''
+        drop shared tables in memory. name: such as 'antibody', None: all
+        '''
+        return LoadData.memo.refresh(name)
+
+    @staticmethod
+    def antibody(refresh:bool=False):
+        '''
+        shared table: treat the returned DataFrame as read-only
+        '''
         def func(x):
             if x == 'H':
                 return 'Heavy'
@@ -23,96 +336,345 @@ class LoadData:
             elif x == 'L':
                 return 'Lambda'
             return x
-        query = "select * from view_antibody;"
-        df = QueryComplex(True).list_data(query, True)
-        df['chain_type'] = df['chain_type'].map(func)
-        print('antibody, pdb: ', len(df['pdb_id'].unique()))
-        print('antibody, chains:', len(df['chain_id'].unique()))
-        return df
+        # concurrent loaders wait for one query
+        with LoadData.memo_lock:
+            df = None if refresh else LoadData.memo.get('antibody')
+            if df is None:
+                # raw values: chain types are renamed before encoding
+                if LoadData.use_snapshots:
+                    df = LoadData.incremental('view_antibody', full=refresh, encode=False)
+                else:
+                    query = "select * from view_antibody;"
+                    df = LoadData.query(query, refresh=refresh, encode=False)
+                df['chain_type'] = df['chain_type'].map(func)
+                df = LoadData.encode(df)
+                print('antibody, pdb: ', len(df['pdb_id'].unique()))
+                print('antibody, chains:', len(df['chain_id'].unique()))
+                LoadData.memo.put('antibody', df)
+        # new columns added by callers are not shared
+        return df.copy(deep=False)
     
+    @staticmethod
+    def release_counts() -> pd.DataFrame:
+        '''
+        number of pdb by release year, for PlotPdb.bar_release()
+        '''
+        query = """
+            select extract(year from release_date) as year,
+                count(distinct pdb_id) as count
+            from view_antibody
+            where release_date is not null
+            group by extract(year from release_date)
+        ;"""
+        return LoadData.query(query)
+
+    @staticmethod
+    def specie_counts() -> pd.DataFrame:
+        '''
+        number of chains by specie, for PlotSeq.pie_specie_counts()
+        '''
+        query = """
+            select specie, count(*) as count
+            from view_antibody
+            where specie is not null
+            group by specie
+            order by count desc
+        ;"""
+        return LoadData.query(query)
+
+    @staticmethod
+    def complex_counts() -> pd.DataFrame:
+        '''
+        number of pdb by number of chains, for PlotPdb.pie_complex()
+        '''
+        query = """
+            select C.chain_no, count(*) as count
+            from (
+                select pdb_id, count(distinct chain_no) as chain_no
+                from view_antibody
+                group by pdb_id
+            ) C
+            group by C.chain_no
+            order by count desc
+        ;"""
+        return LoadData.query(query)
+
+    @staticmethod
+    def binding_hist(col:str='binding_affinity', bins:int=100, ab_combo2=None) -> pd.DataFrame:
+        '''
+        histogram of binding combos in combo2_contacts, binned by the database
+        col: 'binding_affinity' or 'log-kd'
+        for PlotBinding.hist_binding_affinity() and PlotBinding.hist_kd()
+        '''
+        expr, valid = LoadData.binding_cols[col]
+        tables, combo_filter = LoadData.combo_table(ab_combo2)
+        query = """
+            with V as (
+                select {expr} as x
+                from combo2_contacts
+                where pdb_id in (
+                    select pdb_id from view_antibody
+                )
+                and binding_affinity is not null
+                and {valid}
+                {combo_filter}
+            ),
+            M as (
+                select min(x) as lo, max(x) as hi from V
+            )
+            select coalesce(
+                    least(floor((V.x - M.lo) * {bins} / nullif(M.hi - M.lo, 0)), {bins} - 1),
+                    0
+                ) as bin,
+                count(*) as count, min(M.lo) as lo, min(M.hi) as hi
+            from V cross join M
+            group by 1
+        ;"""
+        params = {'expr': expr, 'valid': valid, 'bins': bins, 'combo_filter': combo_filter}
+        df = LoadData.query(query, params, tables=tables)
+
+        # all bins including empty ones
+        count = np.zeros(bins, dtype=int)
+        edges = np.zeros(bins + 1)
+        if len(df):
+            count[df['bin'].astype(int)] = df['count']
+            edges = np.linspace(float(df['lo'].iloc[0]), float(df['hi'].iloc[0]), bins + 1)
+        return pd.DataFrame({
+            'bin_start': edges[:-1],
+            'bin_end': edges[1:],
+            'count': count,
+        })
+
+    @staticmethod
+    def binding_sketch(col:str='binding_affinity', ab_combo2=None, k:int=1000) -> QuantileSketch:
+        '''
+        quantile sketch of the values binned by binding_hist()
+        for the threshold lines of PlotBinding.hist_binding_affinity() and hist_kd()
+        '''
+        expr, valid = LoadData.binding_cols[col]
+        tables, combo_filter = LoadData.combo_table(ab_combo2)
+        query = """
+            select combo_id, {expr} as x
+            from combo2_contacts
+            where pdb_id in (
+                select pdb_id from view_antibody
+            )
+            and binding_affinity is not null
+            and {valid}
+            {combo_filter}
+        ;"""
+        params = {'expr': expr, 'valid': valid, 'combo_filter': combo_filter}
+        return LoadData.sketch(query, ['x'], params, key='combo_id', k=k,
+            tables=tables)['x']
+
+    @staticmethod
+    def combo_table(ab_combo2) -> tuple:
+        '''
+        combo_id of ab_combo2 as a joined table, not a literal list in SQL
+        '''
+        if ab_combo2 is None:
+            return None, ''
+        # sorted plain values, also of categorical combo_id in compact frames
+        ids = np.unique(np.asarray(ab_combo2['combo_id'].dropna()))
+        combos = pd.DataFrame({'combo_id': pd.Series(ids).infer_objects()})
+        return {'tmp_combos': combos}, "and combo_id in (select combo_id from {tmp_combos})"
+
     @staticmethod
     def imgt_regions():
-        query = f"""
+        query = """
             select V.pdb_id, V.chain_id, A.chain_no,
                 V.region_name, V.seq_from, V.seq_to, V.seq
             from align_vfrag V
             left join view_antibody A on V.chain_id = A.chain_id
             where A.model_no = 0
         ;"""
-        df = QueryComplex(True).list_data(query, True)
+        df = LoadData.query(query)
         df['seq_len'] = df['seq_to'] - df['seq_from'] + 1
         print('pdb', df['pdb_id'].nunique())
         print('chains', df['chain_id'].nunique())
 
-        vg = df.groupby(['pdb_id', 'chain_no', 'region_name'])
-        vg = dict(tuple(vg))
+        vg = RegionIndex(df)
         return df, vg
     
+    distance_query = """
+        select D.pdb_id, D.combo_id, C.chain_combo, D.relative_pkl
+        from {table_name} D
+        left join meta_combo2 C on D.combo_id = C.combo_id
+        where D.pdb_id in (
+            select distinct pdb_id from view_antibody
+        )
+        AND D.relative_pkl is not null
+    ;"""
+
     @staticmethod
     def distance(table_name):
-        query = f"""
-            select D.pdb_id, D.combo_id, C.chain_combo, D.relative_pkl
-            from {table_name} D
-            left join meta_combo2 C on D.combo_id = C.combo_id
-            where D.pdb_id in (
-                select distinct pdb_id from view_antibody
-            )
-            AND D.relative_pkl is not null
-        ;"""
-        rows = QueryComplex(True).list_data(query)
-        df = pd.DataFrame(rows)
+        df = LoadData.query(LoadData.distance_query, {'table_name': table_name})
+        rows = df.to_dict('records')
         print('pdb', df['pdb_id'].nunique())
         print('combo', df['combo_id'].nunique())
         print('regions', len(rows))
         return rows
 
+    @staticmethod
+    def iter_distance(table_name, chunksize:int=100000,
+            key=('pdb_id', 'combo_id', 'relative_pkl')):
+        '''
+        key: unique key of distance_query, one pickle per row
+        '''
+        return LoadData.query_chunks(LoadData.distance_query,
+            {'table_name': table_name}, chunksize, key)
+
+    @staticmethod
+    def distance_summary(table_name, chunksize:int=100000) -> dict:
+        '''
+        the counts printed by distance(), one chunk in memory at a time
+        '''
+        pdb, combo, n = set(), set(), 0
+        for df in LoadData.iter_distance(table_name, chunksize):
+            pdb.update(df['pdb_id'].unique())
+            combo.update(df['combo_id'].unique())
+            n += len(df)
+        print('pdb', len(pdb))
+        print('combo', len(combo))
+        print('regions', n)
+        return {'pdb': len(pdb), 'combo': len(combo), 'regions': n}
+
     @staticmethod
     def cal_overlapping(ref_bound:tuple, test_bound:tuple, offset:int):
-        c = 0
+        '''
+        rate of reference positions [start-offset, end+offset) covered by
+        the test bound [start, end). Scalars or arrays are accepted.
+        '''
         ref_start, ref_end = ref_bound
         test_start, test_end = test_bound
-        for i in range(ref_start-offset, ref_end+offset):
-            if test_start <= i < test_end:
-                c += 1
-        r = c/(ref_end - ref_start)
-        return 1 if r > 1 else r
+        # integer positions i, test_start <= i < test_end
+        lo = np.maximum(np.subtract(ref_start, offset), np.ceil(test_start))
+        hi = np.minimum(np.add(ref_end, offset), np.ceil(test_end))
+        c = np.clip(np.subtract(hi, lo), 0, None)
+        r = c / np.subtract(ref_end, ref_start)
+        return np.minimum(r, 1)
+
+    @staticmethod
+    def region_bounds(vg, region_names=None) -> pd.DataFrame:
+        '''
+        one row per (pdb_id, chain_no, region_name)
+        vg: RegionIndex or DataFrame returned by imgt_regions(), or
+            dict(tuple(df.groupby(['pdb_id', 'chain_no', 'region_name'])))
+        '''
+        if isinstance(region_names, str):
+            region_names = [region_names]
+        if isinstance(vg, RegionIndex):
+            df = vg.first(region_names)
+        elif isinstance(vg, dict):
+            groups = [v.iloc[:1] for k, v in vg.items() \
+                if region_names is None or k[2] in region_names]
+            df = pd.concat(groups) if groups else pd.DataFrame(
+                columns=['pdb_id', 'chain_no', 'region_name', 'seq_from', 'seq_to'])
+        else:
+            df = vg
+            if region_names is not None:
+                df = df[df['region_name'].isin(region_names)]
+            df = df.drop_duplicates(['pdb_id', 'chain_no', 'region_name'])
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def motif_bounds(motifs:pd.DataFrame) -> pd.DataFrame:
+        '''
+        motifs determined by experimental data, renamed for scan_regions()
+        '''
+        names = {
+            'seq': 'aa',
+            'pair_aa': 'pair_aa',
+            'start': 'exp_start',
+            'end': 'exp_end',
+            'pair_chain_no': 'pair_chain_no',
+            'combo_id': 'combo_id',
+        }
+        cols = ['pdb_id', 'chain_no'] + [k for k in names if k in motifs]
+        exp = motifs[cols].rename(columns=names)
+        exp = exp.dropna(subset=['pdb_id', 'chain_no'])
+        return exp.reindex(columns=['pdb_id', 'chain_no'] + list(names.values()))
+
+    @staticmethod
+    def overlap_pairs(regions:pd.DataFrame, exp:pd.DataFrame, offsets) -> tuple:
+        '''
+        join region boundaries with motifs on (pdb_id, chain_no) and
+        calculate overlapping for every offset: one column per offset
+        '''
+        bounds = regions[['pdb_id', 'chain_no', 'seq_from', 'seq_to']]
+        bounds = bounds.rename_axis('region_idx').reset_index()
+        pairs = bounds.merge(exp, on=['pdb_id', 'chain_no'])
+        # alignment bounds are 1-based and inclusive
+        aln_start = pairs['seq_from'].to_numpy(float)[:, None] - 1
+        aln_end = pairs['seq_to'].to_numpy(float)[:, None]
+        overlap = LoadData.cal_overlapping(
+            (aln_start, aln_end),
+            (pairs['exp_start'].to_numpy(float)[:, None],
+                pairs['exp_end'].to_numpy(float)[:, None]),
+            np.asarray(offsets)[None, :]
+        )
+        pairs = pairs.drop(columns=['pdb_id', 'chain_no', 'seq_from', 'seq_to'])
+        return pairs, overlap
+
+    @staticmethod
+    def best_overlap(pairs:pd.DataFrame, overlap) -> pd.DataFrame:
+        '''
+        motif of the best overlapping per region row. ties keep motif order
+        '''
+        pairs = pairs.assign(overlap=overlap)
+        pairs = pairs[pairs['overlap'] > 0]
+        pairs = pairs.sort_values('overlap', ascending=False, kind='stable')
+        return pairs.drop_duplicates('region_idx').set_index('region_idx')
 
     @staticmethod
     def scan_regions(region_name, motifs, vg, offset:int=0):
-        res = []
-        # motifs determined by experimental data
-        mg = motifs.groupby(['pdb_id','chain_no'])
-        for (pdb_id, chain_no), sub in mg:
-            key = (pdb_id, chain_no, region_name)
-            if key in vg:
-                region = vg[key].iloc[0]
-                aln_start, aln_end = int(region['seq_from'])-1, int(region['seq_to'])
-                overlap = []
-                for i, row in sub.iterrows():
-                    exp_start, exp_end = row['start'], row['end']
-                    _overlap = LoadData.cal_overlapping(
-                        (aln_start, aln_end),
-                        (exp_start, exp_end),
-                        offset
-                    )
-                    overlap.append(_overlap)
-                sub['overlap'] = overlap
-                sub = sub[sub['overlap']>0].sort_values('overlap', ascending=False)
-                aln = region.to_dict()
-                if len(sub):
-                    exp = sub.iloc[0].to_dict()
-                    aln.update({
-                        'aa': exp.get('seq'),
-                        'pair_aa': exp.get('pair_aa'),
-                        'exp_start': exp.get('start'),
-                        'exp_end': exp.get('end'),
-                        'pair_chain_no': exp.get('pair_chain_no'),
-                        'combo_id': exp.get('combo_id'),
-                        'overlap': exp.get('overlap'),
-                    })
-                res.append(aln)
+        exp = LoadData.motif_bounds(motifs)
+        regions = LoadData.region_bounds(vg, region_name)
+        # chains with motifs
+        chains = exp[['pdb_id', 'chain_no']].drop_duplicates()
+        regions = regions.merge(chains, on=['pdb_id', 'chain_no'])
+        regions = regions.sort_values(['pdb_id', 'chain_no'], kind='stable')
+        regions = regions.reset_index(drop=True)
+
+        pairs, overlap = LoadData.overlap_pairs(regions, exp, [offset])
+        best = LoadData.best_overlap(pairs, overlap[:, 0])
+        res = regions.join(best)
         print(region_name, len(res))
-        return pd.DataFrame(res).fillna(0)
+        return res.fillna(0)
+
+    @staticmethod
+    def sweep_regions(region_names:list, motifs, vg, offsets:list=[0,]):
+        '''
+        scan_regions() of many regions and offsets in one pass
+        return overlapping indexed by (pdb_id, chain_no, region_name, offset)
+        example: df.xs(1, level='offset') equals scan_regions(.., offset=1)
+        '''
+        offsets = np.asarray(offsets)
+        exp = LoadData.motif_bounds(motifs)
+        regions = LoadData.region_bounds(vg, region_names)
+        chains = exp[['pdb_id', 'chain_no']].drop_duplicates()
+        regions = regions.merge(chains, on=['pdb_id', 'chain_no'])
+        regions = regions.sort_values(['pdb_id', 'chain_no', 'region_name'], kind='stable')
+        regions = regions.reset_index(drop=True)
+
+        # overlapping: motifs x offsets
+        pairs, overlap = LoadData.overlap_pairs(regions, exp, offsets)
+        i, j = np.nonzero(overlap > 0)
+        hits = pairs.iloc[i].reset_index(drop=True)
+        hits['offset'] = offsets[j]
+        hits['overlap'] = overlap[i, j]
+        hits = hits.sort_values('overlap', ascending=False, kind='stable')
+        best = hits.drop_duplicates(['region_idx', 'offset'])
+        best = best.set_index(['region_idx', 'offset'])
+
+        # all regions x offsets
+        grid = pd.MultiIndex.from_product(
+            [regions.index, offsets], names=['region_idx', 'offset'])
+        res = best.reindex(grid).reset_index()
+        res = regions.join(res.set_index('region_idx'))
+        res = res.set_index(['pdb_id', 'chain_no', 'region_name', 'offset'])
+        print('regions', len(regions), 'offsets', len(offsets))
+        return res.fillna(0)
     
     @staticmethod
     def plddt_rmsd():
@@ -126,8 +688,8 @@ class LoadData:
                 and r.rmsd is not null
                 and p.ranking=1
         ;"""
-        pdf = QueryComplex(True).list_data(query, True)
-        df = pd.merge(pdf, adf, how='left', on='chain_id')
+        pdf = LoadData.query(query)
+        df = LoadData.merge(pdf, adf, how='left', on='chain_id')
         df = df.dropna()
         return df
 
@@ -143,14 +705,14 @@ class LoadData:
                 and r.tm1 is not null
                 and p.ranking=1
         ;"""
-        pdf = QueryComplex(True).list_data(query, True)
-        df = pd.merge(pdf, adf, how='left', on='chain_id')
+        pdf = LoadData.query(query)
+        df = LoadData.merge(pdf, adf, how='left', on='chain_id')
         return df
     
     @staticmethod
     def rmsd_confidence(chain_status):
         adf = LoadData.antibody()
-        query = f"""
+        query = """
             select a.chain_id, a.avg_plddt, a.avg_ptm, 
                 a.max_pae, r.rmsd, t.tm1
             from chain_afsum a
@@ -159,8 +721,8 @@ class LoadData:
             where a.ranking=1
                 and r.chain_status='{chain_status}'
         ;"""
-        pdf = QueryComplex(True).list_data(query, True)
-        df = pd.merge(pdf, adf, how='left', on='chain_id')
+        pdf = LoadData.query(query, {'chain_status': chain_status})
+        df = LoadData.merge(pdf, adf, how='left', on='chain_id')
         df = df.dropna()
         return df
     
@@ -172,7 +734,7 @@ class LoadData:
                 select chain_id from view_antibody
             )
         """
-        df = QueryComplex(True).list_data(query, True)
+        df = LoadData.query(query)
         g = df.groupby('first_chain_id')
         return g
         
@@ -185,8 +747,8 @@ class LoadData:
                 select chain_id from view_antibody
             )
         """
-        df = QueryComplex(True).list_data(query, True)
-        df = pd.merge(df, adf, how='left', on='chain_id')
+        df = LoadData.query(query)
+        df = LoadData.merge(df, adf, how='left', on='chain_id')
         df = df.dropna()
         return df
     
@@ -194,8 +756,8 @@ class LoadData:
     def chain_afsum():
         adf = LoadData.antibody()
         query = "select * from chain_afsum;"
-        pdf = QueryComplex(True).list_data(query, True)
-        df = pd.merge(pdf, adf, how='left', on='chain_id')
+        pdf = LoadData.query(query)
+        df = LoadData.merge(pdf, adf, how='left', on='chain_id')
         df = df[df['ranking']==1]
         df = df.dropna()
         print(df.shape)
@@ -203,42 +765,68 @@ class LoadData:
         return df
     
     @staticmethod
-    def abag_dist_stat(pfile):
-        res = []
-        data = ProcessPickle(pfile).load_pickle([])
-        for row in data:
-            dist = row['dist']['value'].sort_values()
-            rec = {
-                'pdb_id': row['pdb_id'],
-                'combo_id': row['combo_id'],
-                'chain_combo': row['chain_combo'],
-                'ab_chain_no': row['ab_chain_no'],
-                '1th': dist[0],
-                '2th': dist[1] if 1 < len(dist) else None,
-                '3th': dist[2] if 2 < len(dist) else None,
-                '4th': dist[3] if 3 < len(dist) else None,
-                '5th': dist[4] if 4 < len(dist) else None,
-                '10th': dist[9] if 9 < len(dist) else None,
-                'mean5th': np.mean(dist[:5]) if 4 < len(dist) else None,
-                'mean10th': np.mean(dist[:10]) if 9 < len(dist) else None,
-            }
-            res.append(rec)
-        print('number of abag dimer:', len(res))
-        return pd.DataFrame(res)
+    def distance_store(table_name, data_dir:str, store_dir:str) -> DistanceStore:
+        '''
+        convert relative_pkl files of distance() into one DistanceStore
+        '''
+        rows = LoadData.distance(table_name)
+        def records():
+            for row in rows:
+                pfile = os.path.join(data_dir, row['relative_pkl'])
+                for rec in DistanceStore.read_pickles([pfile]):
+                    # fields of the database fill missing fields
+                    yield {**row, **rec}
+        return DistanceStore.write(records(), store_dir)
+
+    @staticmethod
+    def distance_stat(table_name, data_dir:str, workers:int=None, ranks:tuple=None,
+            means:tuple=None):
+        '''
+        statistics of abag_dist_stat() over relative_pkl files of distance(),
+        read by threads and unpickled by processes.
+        return statistics and errors: [(relative_pkl, error), ...]
+        '''
+        rows = LoadData.distance(table_name)
+        ingest = DistIngest(data_dir, workers)
+        df = ingest.run(rows, ranks, means)
+        print('number of abag dimer:', len(df))
+        print('failed files:', len(ingest.errors))
+        return df, ingest.errors
+
+    @staticmethod
+    def abag_dist_stat(pfile, ranks:tuple=None, means:tuple=None):
+        '''
+        pfile: pickle of records or directory of DistanceStore
+        ranks, means: default DistStat.ranks and DistStat.means
+        '''
+        cols = ['pdb_id', 'combo_id', 'chain_combo', 'ab_chain_no']
+        if os.path.isdir(pfile):
+            store = DistanceStore(pfile)
+            meta = store.meta[cols]
+            values, offsets = store.values, store.offsets
+        else:
+            data = list(DistanceStore.read_pickles([pfile]))
+            meta = pd.DataFrame([{k: row[k] for k in cols} for row in data], columns=cols)
+            values, offsets = DistStat.ragged(row['dist']['value'] for row in data)
+        stat = DistStat.stat(values, offsets, ranks, means)
+        df = pd.concat([meta.reset_index(drop=True), stat], axis=1)
+        print('number of abag dimer:', len(df))
+        return df
+
+    combo2_contacts_query = """
+        select * from combo2_contacts
+        where pdb_id in (
+            select pdb_id from view_antibody    
+        );
+    """
 
     @staticmethod
     def combo2_contacts(ab_combo2=None):
-        query = """
-            select * from combo2_contacts
-            where pdb_id in (
-                select pdb_id from view_antibody    
-            );
-        """
-        df = QueryComplex(True).list_data(query, True)
+        df = LoadData.query(LoadData.combo2_contacts_query)
         df['log-kd'] = df['dissociation_constant'].map(lambda x: np.log(x))
         # keep antibody only
         if ab_combo2 is not None:
-            df = df.merge(ab_combo2, how='inner', on='combo_id')
+            df = LoadData.merge(df, ab_combo2, how='inner', on='combo_id')
         print(df.shape)
         print(df.iloc[0].to_dict())
         # not binding
@@ -248,3 +836,37 @@ class LoadData:
         df1 = df[df['binding_affinity'].notna()]
         print('binding:', len(df1))
         return df0, df1
+
+    @staticmethod
+    def iter_combo2_contacts(ab_combo2=None, chunksize:int=100000, key='combo_id'):
+        '''
+        chunks of combo2_contacts(), not split into binding or not
+        '''
+        chunks = LoadData.query_chunks(LoadData.combo2_contacts_query,
+            None, chunksize, key)
+        for df in chunks:
+            df['log-kd'] = df['dissociation_constant'].map(lambda x: np.log(x))
+            if ab_combo2 is not None:
+                df = LoadData.merge(df, ab_combo2, how='inner', on='combo_id')
+            yield df
+
+    @staticmethod
+    def combo2_contacts_summary(ab_combo2=None, chunksize:int=100000) -> dict:
+        '''
+        the counts printed by combo2_contacts(), one chunk in memory at a time
+        '''
+        n, ncol, first = 0, 0, None
+        n0, n1 = 0, 0
+        for df in LoadData.iter_combo2_contacts(ab_combo2, chunksize):
+            if first is None and len(df):
+                first = df.iloc[0].to_dict()
+            n += len(df)
+            ncol = df.shape[1]
+            binding = df['binding_affinity'].notna()
+            n1 += int(binding.sum())
+            n0 += int((~binding).sum())
+        print((n, ncol))
+        print(first)
+        print('no binding:', n0)
+        print('binding:', n1)
+        return {'rows': n, 'no binding': n0, 'binding': n1}
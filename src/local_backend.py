@@ -0,0 +1,56 @@
+'''
+embedded database over tables stored as files, a local stand-in for
+bioomics.QueryComplex
+'''
+import os
+from query_cache import FORMATS, read_frame
+
+
+class LocalBackend:
+
+    def __init__(self, data_dir:str):
+        '''
+        data_dir: <table>.parquet or <table>.pkl.gz, such as the snapshots
+            written by LoadData.incremental() or LoadData.export_tables()
+        duckdb reads parquet files in place and parses the SQL of LoadData,
+        such as extract(year from ...), least() and ln()
+        '''
+        self.data_dir = data_dir
+        self.con = self.connect()
+
+    def tables(self) -> dict:
+        tables = {}
+        for name in sorted(os.listdir(self.data_dir)):
+            table, _, fmt = name.partition('.')
+            if fmt in FORMATS and table not in tables:
+                tables[table] = os.path.join(self.data_dir, name)
+        return tables
+
+    def connect(self):
+        import duckdb
+        con = duckdb.connect()
+        for table, path in self.tables().items():
+            if path.endswith('.parquet'):
+                con.execute(f"create view {table} as select * from read_parquet('{path}')")
+            else:
+                con.register(table, read_frame(path))
+        return con
+
+    def list_data(self, query:str, as_df:bool=False):
+        '''
+        same as QueryComplex.list_data()
+        '''
+        df = self.con.execute(query).df()
+        return df if as_df else df.to_dict('records')
+
+    def register(self, name:str, df):
+        '''
+        DataFrame as a table of the next queries, not copied
+        '''
+        self.con.register(name, df)
+
+    def unregister(self, name:str):
+        self.con.unregister(name)
+
+    def close(self):
+        self.con.close()
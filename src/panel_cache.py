@@ -0,0 +1,129 @@
+'''
+computed data of figure panels, keyed by fingerprints of inputs and parameters
+'''
+import hashlib
+import inspect
+import json
+import os
+from functools import lru_cache
+import threading
+import numpy as np
+import pandas as pd
+from query_cache import default_dir, MemoryCache
+
+
+class PanelCache:
+    '''
+    drawing is separated from the computing of panel data, so a panel whose
+    inputs and parameters are unchanged is redrawn from the cached data.
+    style parameters such as labels and colors are not part of the key.
+    the key includes the source files of the compute code, so editing them
+    computes again; bump PanelCache.version to discard all cached panels
+    '''
+    version = 1
+
+    def __init__(self, cache_dir:str=None, maxsize:int=64, verbose:bool=False):
+        self.cache_dir = cache_dir or os.path.join(default_dir(), 'panels')
+        self.memo = MemoryCache(maxsize=maxsize)
+        self.verbose = verbose
+        self.hits, self.misses = 0, 0
+
+    @staticmethod
+    def fingerprint(*items) -> str:
+        '''
+        sha1 of DataFrames, Series, arrays and json-like values
+        '''
+        h = hashlib.sha1()
+        for item in items:
+            if isinstance(item, (pd.DataFrame, pd.Series)):
+                if isinstance(item, pd.DataFrame):
+                    meta = [list(map(str, item.columns)), list(map(str, item.dtypes))]
+                else:
+                    meta = [str(item.name), str(item.dtype)]
+                meta.append(list(item.shape))
+                h.update(json.dumps(meta).encode())
+                h.update(pd.util.hash_pandas_object(item, index=True).to_numpy().tobytes())
+            elif isinstance(item, np.ndarray):
+                h.update(f"{item.dtype}{item.shape}".encode())
+                h.update(np.ascontiguousarray(item).tobytes())
+            else:
+                h.update(json.dumps(item, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def file_hash(path:str, mtime:float) -> str:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @staticmethod
+    def source(*objs) -> str:
+        '''
+        sha1 of the source files of functions, classes or modules
+        '''
+        h = hashlib.sha1()
+        files, texts = set(), []
+        for obj in objs:
+            path = inspect.getsourcefile(obj)
+            if path and os.path.isfile(path):
+                files.add(path)
+            else:
+                # code of notebooks and interactive sessions
+                try:
+                    texts.append(inspect.getsource(obj))
+                except (OSError, TypeError):
+                    pass
+        for path in sorted(files):
+            h.update(PanelCache.file_hash(path, os.path.getmtime(path)).encode())
+        for text in texts:
+            h.update(text.encode())
+        return h.hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl.gz")
+
+    def get(self, key:str):
+        data = self.memo.get(key)
+        if data is None and os.path.isfile(self.path(key)):
+            data = self.memo.put(key, pd.read_pickle(self.path(key)))
+        return data
+
+    def put(self, key:str, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write a temporary file then rename, safe for concurrent writers
+        tmp = f"{self.path(key)}.{os.getpid()}-{threading.get_ident()}.tmp"
+        pd.to_pickle(data, tmp, compression='gzip')
+        os.replace(tmp, self.path(key))
+        return self.memo.put(key, data)
+
+    def compute(self, name:str, inputs, params:dict, func, code:tuple=()):
+        '''
+        name: panel, such as 'PlotPredict.dot_plddt_rmsd'
+        inputs: DataFrame or list of inputs used by func
+        params: parameters changing the data
+        func: called without arguments if not cached
+        code: classes or functions called by func in other modules,
+            such as GroupStat. the module of func is always included
+        '''
+        inputs = inputs if isinstance(inputs, (list, tuple)) else [inputs]
+        key = self.fingerprint(name, params, self.version,
+            self.source(func, *code), *inputs)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            if self.verbose:
+                print('cached panel:', name, key)
+            return data
+        self.misses += 1
+        return self.put(key, func())
+
+    def clear(self) -> int:
+        self.memo.refresh()
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        n = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl.gz'):
+                os.remove(os.path.join(self.cache_dir, name))
+                n += 1
+        return n
@@ -1,18 +1,102 @@
+import os
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from region_index import RegionIndex
+from dist_store import DistanceStore
 
 class ParseVfrag:
     data_dir = '/home/yuan/output/pdb'
 
-    def __init__(self, vregion, dist, verbose:bool=False):
+    def __init__(self, vregion, dist, verbose:bool=False, data_dir:str=None):
+        '''
+        vregion: DataFrame of LoadData.imgt_regions()
+        dist: rows of LoadData.distance()
+        data_dir: root of relative_pkl, default ParseVfrag.data_dir
+        '''
         self.vregion = vregion
         self.dist = dist
         self.verbose = verbose
+        self.data_dir = data_dir or self.data_dir
         self.data = None
-    
-    def process(self):
-        vg = self.vregion.groupby(['pdb_id', 'chain_no', 'region_name'])
-        vg = dict(tuple(vg))
 
+    def records(self):
+        '''
+        load distance files one at a time
+        '''
+        for row in self.dist:
+            pfile = os.path.join(self.data_dir, row['relative_pkl'])
+            for rec in DistanceStore.read_pickles([pfile], self.verbose):
+                # fields of the database fill missing fields
+                yield {**row, **rec}
+
+    @staticmethod
+    def residues(dist) -> np.ndarray:
+        '''
+        residue numbers of distances: explicit integer index of the Series,
+        otherwise 1-based positions along the antibody chain. A default
+        RangeIndex counts from 0, so it is positions, not residue numbers
+        '''
+        index = getattr(dist, 'index', None)
+        if index is not None and not isinstance(index, pd.RangeIndex) \
+            and pd.api.types.is_integer_dtype(index.dtype):
+            return np.asarray(index)
+        return np.arange(1, len(dist) + 1)
+
+    @staticmethod
+    def summarize(regions:pd.DataFrame, dist, cutoff:float) -> dict:
+        '''
+        distances within [seq_from, seq_to] of every region.
+        num_residues counts NaN distances, min_dist and mean_dist skip them
+        '''
+        pos = ParseVfrag.residues(dist)
+        values = np.asarray(dist, dtype=float)
+        order = np.argsort(pos, kind='stable')
+        pos, values = pos[order], values[order]
+        lo = np.searchsorted(pos, regions['seq_from'].to_numpy(), side='left')
+        hi = np.searchsorted(pos, regions['seq_to'].to_numpy(), side='right')
+
+        # segment sums from cumulative sums, a NaN is not carried forward
+        zero = np.zeros(1)
+        cum_contacts = np.concatenate([zero, np.cumsum(values <= cutoff)])
+        cum_dist = np.concatenate([zero, np.nancumsum(values)])
+        cum_valid = np.concatenate([zero, np.cumsum(~np.isnan(values))])
+        num = hi - lo
+        num_valid = cum_valid[hi] - cum_valid[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (cum_dist[hi] - cum_dist[lo]) / num_valid
+        # a few regions per chain
+        min_dist = np.array([np.nanmin(values[l:h]) if num_valid[i] > 0 else np.nan \
+            for i, (l, h) in enumerate(zip(lo, hi))])
+        return {
+            'num_residues': num,
+            'num_contacts': (cum_contacts[hi] - cum_contacts[lo]).astype(int),
+            'min_dist': min_dist,
+            'mean_dist': np.where(num_valid > 0, mean, np.nan),
+        }
+
+    def process(self, cutoff:float=10):
+        '''
+        yield contact summaries per (pdb_id, combo_id, chain_no, region_name)
+        cutoff: distance of contacts
+        '''
+        vg = RegionIndex(self.vregion)
+        for rec in self.records():
+            regions = vg.chain(rec['pdb_id'], rec['ab_chain_no'])
+            if regions is None:
+                continue
+            stat = self.summarize(regions, rec['dist']['value'], cutoff)
+            for i, region in enumerate(regions.itertuples(index=False)):
+                yield {
+                    'pdb_id': rec['pdb_id'],
+                    'combo_id': rec.get('combo_id'),
+                    'chain_no': rec['ab_chain_no'],
+                    'region_name': region.region_name,
+                    'seq_from': region.seq_from,
+                    'seq_to': region.seq_to,
+                    'num_residues': int(stat['num_residues'][i]),
+                    'num_contacts': int(stat['num_contacts'][i]),
+                    'min_dist': stat['min_dist'][i],
+                    'mean_dist': stat['mean_dist'][i],
+                }
@@ -4,9 +4,11 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from scipy.stats import pearsonr
-from sklearn.metrics import precision_recall_curve, roc_curve, auc
+from panel_cache import PanelCache
+from binary_curve import BinaryCurve
 
 class PlotBinding:
+    panel_cache = PanelCache()
 
     def __init__(self, data, verbose:bool=True):
         self.data = data
@@ -19,31 +21,111 @@ class PlotBinding:
         ax.set_xlabel('Number of Ca contacts')
         ax.set_ylabel('Percentage, %')
     
-    def hist_binding_affinity(self, ax):
-        df = self.data
-        sns.histplot(df, x='binding_affinity', stat='percent', ax=ax, bins=100, color='grey')
+    @staticmethod
+    def hist_bars(ax, hist:pd.DataFrame, color:str):
+        '''
+        draw pre-binned counts, such as LoadData.binding_hist()
+        '''
+        edges = list(hist['bin_start']) + [hist['bin_end'].iloc[-1]]
+        sns.histplot(hist, x='bin_start', weights='count', bins=edges,
+            stat='percent', ax=ax, color=color)
+        return ax
+
+    @staticmethod
+    def hist_quantile(hist:pd.DataFrame, q:float) -> float:
+        '''
+        quantile interpolated within bins, error is at most one bin width
+        '''
+        count = hist['count'].to_numpy(float)
+        cum = np.cumsum(count)
+        target = q * cum[-1]
+        i = min(np.searchsorted(cum, target), len(cum) - 1)
+        prev = cum[i-1] if i > 0 else 0
+        frac = (target - prev) / count[i] if count[i] else 0
+        start, end = hist['bin_start'].iloc[i], hist['bin_end'].iloc[i]
+        return start + frac * (end - start)
+
+    def hist_binding_affinity(self, ax, hist:pd.DataFrame=None, sketch=None):
+        '''
+        hist: pre-binned counts from LoadData.binding_hist('binding_affinity')
+        sketch: QuantileSketch of the threshold, such as LoadData.binding_sketch()
+        '''
+        if hist is None:
+            df = self.data
+            sns.histplot(df, x='binding_affinity', stat='percent', ax=ax, bins=100, color='grey')
+            q = np.quantile(df['binding_affinity'], .95)
+        else:
+            PlotBinding.hist_bars(ax, hist, color='grey')
+            q = PlotBinding.hist_quantile(hist, .95)
+        error = ''
+        if sketch is not None:
+            q, error = sketch.quantile(.95), sketch.error_text()
         ax.set_ylim(0,12)
         ax.set_xlabel('Binding affinity, kcal/mol')
         ax.set_ylabel('Percentage, %')
-        q = np.quantile(df['binding_affinity'], .95)
         ax.axvline(q, linestyle='--', color='black')
-        ax.text(-19.8, 10.6, f"95% = {q:.1f}", fontsize=8)
+        ax.text(-19.8, 10.6, f"95% = {q:.1f}{error}", fontsize=8)
 
-    def hist_kd(self, ax):
-        df = self.data
-        sns.histplot(df, x='log-kd', stat='percent', ax=ax, bins=100, color='grey')
+    def hist_kd(self, ax, hist:pd.DataFrame=None, sketch=None):
+        '''
+        hist: pre-binned counts from LoadData.binding_hist('log-kd')
+        sketch: QuantileSketch of log-kd, such as LoadData.binding_sketch('log-kd')
+        '''
+        if hist is None:
+            df = self.data
+            sns.histplot(df, x='log-kd', stat='percent', ax=ax, bins=100, color='grey')
+            q = np.quantile(df['dissociation_constant'], .95)
+        else:
+            PlotBinding.hist_bars(ax, hist, color='grey')
+            q = np.exp(PlotBinding.hist_quantile(hist, .95))
+        error = ''
+        if sketch is not None:
+            q, error = np.exp(sketch.quantile(.95)), sketch.error_text()
         ax.set_ylim(0, 12)
         ax.set_xlabel('Dissociation constant, logM')
         ax.set_ylabel('Percentage, %')
-        q = np.quantile(df['dissociation_constant'], .95)
         ax.axvline(np.log(q), linestyle='--', color='black')
-        ax.text(-10, 10.6, f"95% = {q}", fontsize=8, ha='right')
+        ax.text(-10, 10.6, f"95% = {q}{error}", fontsize=8, ha='right')
 
-    def precision_recall(self, ax, col):
+    def curve_data(self, panel:str, col) -> dict:
+        '''
+        precision-recall or ROC curve of minus distances in col
+        '''
         droc = self.data[col]
-        precisions, recalls, thresholds = precision_recall_curve(
-            droc['y'], -droc[col]
-        )
+        def compute():
+            df = droc[droc[col].notna()]
+            counts = BinaryCurve.counts(df['y'], -df[col])
+            if panel == 'roc':
+                fpr, tpr, thresholds = BinaryCurve.roc(*counts)
+                return {'fpr': fpr, 'tpr': tpr, 'thresholds': thresholds,
+                    'auc': BinaryCurve.auc(fpr, tpr)}
+            precisions, recalls, thresholds = BinaryCurve.pr(*counts)
+            return {'precision': precisions, 'recall': recalls,
+                'thresholds': thresholds}
+        return self.panel_cache.compute(f"PlotBinding.{panel}",
+            droc[['y', col]], {'col': col}, compute, (BinaryCurve,))
+
+    def evaluate(self, cols:list=None, by:str=None, cuts:tuple=(-10, -20),
+            n_boot:int=0, ci:float=.95) -> pd.DataFrame:
+        '''
+        AUC, average precision and metrics at cuts of every col and group of by,
+        see BinaryCurve.evaluate(). auc_lo and auc_hi if n_boot
+        '''
+        cols = list(self.data) if cols is None else list(cols)
+        keys = ['y'] if by is None else ['y', by]
+        inputs = [self.data[col][keys + [col]] for col in cols]
+        params = {'cols': [str(c) for c in cols], 'by': by, 'cuts': list(cuts),
+            'n_boot': n_boot, 'ci': ci}
+        stat = self.panel_cache.compute('PlotBinding.evaluate', inputs, params,
+            lambda: BinaryCurve.evaluate(self.data, cols, by, cuts, n_boot, ci), (BinaryCurve,))
+        if self.verbose:
+            print(stat.to_string(index=False))
+        return stat
+
+    def precision_recall(self, ax, col):
+        curve = self.curve_data('precision_recall', col)
+        precisions, recalls, thresholds = curve['precision'], curve['recall'], \
+            curve['thresholds']
         ax.plot(thresholds, recalls[:-1], label='Recall',
             color='black', linestyle='-')
         ax.plot(thresholds, precisions[:-1], label='Precision',
@@ -54,14 +136,20 @@ class PlotBinding:
         ax.set_xlabel('Minus minimum distance of Ca, -$\AA$')
         ax.legend(loc='center left', fontsize=8)
 
-    def roc(self, ax, col):
-        droc = self.data[col]
-        fpr, tpr, thresholds = roc_curve(droc['y'], -droc[col])
-        roc_auc = auc(fpr, tpr)
+    def roc(self, ax, col, n_boot:int=0):
+        '''
+        n_boot: bootstrap resamples of the AUC interval in the title
+        '''
+        curve = self.curve_data('roc', col)
+        fpr, tpr, roc_auc = curve['fpr'], curve['tpr'], curve['auc']
         ax.plot(fpr, tpr, color='black')
         ax.set_xlabel('False positive rate')
         ax.set_ylabel('True positive rate')
-        ax.set_title(f"AUC = {roc_auc:.2f}", fontsize=8)
+        title = f"AUC = {roc_auc:.2f}"
+        if n_boot:
+            stat = self.evaluate([col], n_boot=n_boot).iloc[0]
+            title += f" [{stat['auc_lo']:.2f}, {stat['auc_hi']:.2f}]"
+        ax.set_title(title, fontsize=8)
 
     def box_contacts_distance(self, ax, col):
         df = self.data[self.data[col]<=30].reset_index()
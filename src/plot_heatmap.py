@@ -3,41 +3,41 @@ import pandas as pd
 import seaborn as sns
 import matplotlib as mpl
 import matplotlib.pyplot as plt
+from panel_cache import PanelCache
+from sparse_crosstab import SparseCrosstab
 
 class PlotHeatmap:
+    panel_cache = PanelCache()
+
     def __init__(self, df:pd.DataFrame, verbose:bool=True):
         self.df = df
         self.verbose = verbose
     
+    @staticmethod
+    def abundance(df:pd.DataFrame, region_name:str, col_name:str, row_name:str,
+            num_row:int=10, num_col:int=10) -> pd.DataFrame:
+        '''
+        counts of (row, col) in one region, the top rows and top columns.
+        default rows are seq
+        '''
+        cdf = df[df['region_name']==region_name]
+        return SparseCrosstab(cdf, row_name, col_name).top_block(num_row, num_col)
+
     def region_seq_abundance(self, ax, params):
         region_name = params['region_name']
         col_name = params['col']
         row_name = params['row']
-        cdf = self.df[self.df['region_name']==region_name]
-        cdf = cdf[[col_name, row_name]].groupby([col_name, row_name]).agg(len)
-        cdf = cdf.reset_index().rename(columns={0:'count'})
-        cdf = cdf.pivot(index=row_name, columns=col_name, values='count')
-        cdf = cdf.fillna(0)
-
-        # filter tops in rows: default is seq
         num_row = params.get('num_row', 10)
-        row_counts = cdf.apply(sum, axis=1)
-        row_counts = row_counts.sort_values(ascending=False)
-        top_row_counts = row_counts[:num_row]
-        if self.verbose:
-            print(top_row_counts.index)
-        # filter tops in column
         num_col = params.get('top_col', 10)
-        col_counts = cdf.apply(sum, axis=0)
-        col_counts = col_counts.sort_values(ascending=False)
-        top_col_counts = col_counts[:num_col]
-        if self.verbose:
-            print(top_col_counts.index)
-        
-        # build metrics
-        fcdf = cdf[top_col_counts.index]
-        fcdf = fcdf.loc[top_row_counts.index]
+        data_params = {'region_name': region_name, 'col': col_name, 'row': row_name,
+            'num_row': num_row, 'num_col': num_col}
+        fcdf = self.panel_cache.compute('PlotHeatmap.region_seq_abundance',
+            self.df[['region_name', col_name, row_name]], data_params,
+            lambda: self.abundance(self.df, region_name, col_name, row_name, num_row, num_col),
+            (SparseCrosstab,))
         if self.verbose:
+            print(fcdf.index)
+            print(fcdf.columns)
             print(fcdf.shape)
             print(fcdf.head())
             
@@ -3,17 +3,29 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from density import Density
+from panel_cache import PanelCache
+from violin_kde import ViolinKDE
+from encoding import CodeBook
 
 class PlotPdb:
+    panel_cache = PanelCache()
+
     def __init__(self, df:pd.DataFrame, verbose:bool=True):
         self.df = df
         self.verbose = verbose
     
-    def bar_release(self, ax):
-        self.df['year'] = self.df['release_date'].dt.year
-        pdf = self.df[['pdb_id','year']].drop_duplicates()
-        counts = pdf.groupby('year').agg({'pdb_id':len})
-        counts = counts.reset_index()
+    def bar_release(self, ax, counts:pd.DataFrame=None):
+        '''
+        counts: number of pdb by year, such as LoadData.release_counts()
+        '''
+        if counts is None:
+            self.df['year'] = self.df['release_date'].dt.year
+            pdf = self.df[['pdb_id','year']].drop_duplicates()
+            counts = pdf.groupby('year').agg({'pdb_id':len})
+            counts = counts.reset_index()
+        else:
+            counts = counts[['year', 'count']].copy()
         col1, col2 = 'Year', 'Structures'
         counts.columns = [col1, col2]
         counts[col1] = counts[col1].astype(int)
@@ -29,6 +41,7 @@ class PlotPdb:
 
     def bar_count_pdb(self, ax):
         sdf = self.df[['pdb_id', 'structure_method']].drop_duplicates()
+        sdf = CodeBook.observed(sdf)
         counts = sdf['structure_method'].value_counts()
         num_pdb = len(sdf['pdb_id'].unique())
 
@@ -48,8 +61,8 @@ class PlotPdb:
     def violin_resolution(self, ax):
         sdf = self.df[['pdb_id', 'resolution', 'structure_method']].drop_duplicates()
         rdf = sdf[sdf['resolution'].notna()]
-        sns.violinplot(rdf, x='structure_method', y='resolution', log_scale=True,
-            color='grey', fill=False, inner='stick', ax=ax)
+        ViolinKDE.violinplot(rdf, x='structure_method', y='resolution', log_scale=True,
+            color='grey', fill=False, inner='stick', ax=ax, cache=self.panel_cache)
         ax.set_ylabel(r'Resolution, log-$\AA$')
         ax.set_xlim(-1, 3)
         ax.set_xlabel(None)
@@ -66,34 +79,42 @@ class PlotPdb:
         ax.text(2.6, np.log(r+5), str(r) + r' $\AA$')
         return ax
 
-    def hist_resolution(self, ax):
+    def hist_resolution(self, ax, sketch=None):
         '''
         select best resolution
+        sketch: QuantileSketch of resolution for the quantile lines
         '''
         rdf = self.df[['pdb_id', 'resolution', 'structure_method']].drop_duplicates()
         rdf = rdf[rdf['structure_method'].isin(['x-ray diffraction', 'electron microscopy'])]
+        rdf = CodeBook.observed(rdf)
         sns.histplot(rdf, x='resolution', hue='structure_method', alpha=.5, ax=ax)
         num_pdb = len(rdf['pdb_id'].unique())
         ax.set_xlim(0, 10)
 
         # text
         resolution = rdf['resolution'][rdf['resolution'].notna()]
-        q = .99
-        qr = round(np.quantile(resolution, q), 1)
-        ax.axvline(qr, linestyle='--')
-        ax.text(qr+.1, 200, f"quantile={q}\nresolution={qr}"+ ' $\AA$')
-        q = .95
-        qr = round(np.quantile(resolution, q), 1)
-        ax.axvline(qr, linestyle='--')
-        ax.text(qr+.1, 200, f"quantile={q}\nresolution={qr}"+ ' $\AA$')
+        for q in (.99, .95):
+            if sketch is None:
+                qr, error = round(np.quantile(resolution, q), 1), ''
+            else:
+                qr, error = round(float(sketch.quantile(q)), 1), sketch.error_text()
+            ax.axvline(qr, linestyle='--')
+            ax.text(qr+.1, 200, f"quantile={q}{error}\nresolution={qr}"+ ' $\AA$')
         ax.set_xlabel(r'Resolution, $\AA$')
         ax.set_ylabel('Number of PDB')
         return ax
 
-    def pie_complex(self, ax):
-        num_pdb = len(self.df['pdb_id'].unique())
-        g = self.df.groupby('pdb_id').agg({'chain_no':'nunique'})
-        g = g.value_counts()
+    def pie_complex(self, ax, counts:pd.DataFrame=None):
+        '''
+        counts: number of pdb by number of chains,
+            such as LoadData.complex_counts()
+        '''
+        if counts is None:
+            g = self.df.groupby('pdb_id', observed=True).agg({'chain_no':'nunique'})
+            g = g.value_counts()
+        else:
+            g = counts.sort_values('count', ascending=False)
+            g = g.set_index('chain_no')['count']
         n = 6
         counts = g[:n]
         counts.index = ['monomer','dimer','trimer','tetramer', 'pentamer', 'heptamer']
@@ -119,7 +140,12 @@ class PlotPdb:
         )
         return ax
 
-    def dot_bfactor(self, ax, method, quantile=.9, xlim_max:int=None):
+    def dot_bfactor(self, ax, method, quantile=.9, xlim_max:int=None, mode:str='points',
+            sketches:dict=None):
+        '''
+        mode: one of Density.modes
+        sketches: QuantileSketch of 'avg_bfactor' and 'resolution'
+        '''
         xdf = self.df[self.df['structure_method'].notna()]
         xdf = xdf[xdf['structure_method'].str.contains(method)]
         xdf = xdf[['chain_id', 'resolution', 'avg_bfactor']].dropna()
@@ -127,22 +153,27 @@ class PlotPdb:
         if self.verbose:
             print(xdf.shape)
 
-        sns.scatterplot(xdf, y='resolution', x='avg_bfactor', alpha=.1, s=10, ax=ax)
+        Density.scatter(ax, xdf, 'avg_bfactor', 'resolution', mode, alpha=.1, s=10)
         ax.set_xlabel('Average B-factor')
         ax.set_ylabel(r'Resolution, $\AA$')
         if xlim_max:
             ax.set_xlim(0, xlim_max)
 
         # quantile
-        bq = np.quantile(xdf['avg_bfactor'], quantile)
-        rq = np.quantile(xdf['resolution'], quantile)
+        if sketches is None:
+            bq = np.quantile(xdf['avg_bfactor'], quantile)
+            rq = np.quantile(xdf['resolution'], quantile)
+        else:
+            bq = sketches['avg_bfactor'].quantile(quantile)
+            rq = sketches['resolution'].quantile(quantile)
         ax.axvline(bq, linestyle='--', color='lightgreen')
         ax.axhline(rq, linestyle='--', color='lightgreen')
         rect = patches.Rectangle((-5, -.1), bq+5, rq+.1, facecolor='lightgreen', alpha=.3)
         ax.add_patch(rect)
         if self.verbose:
-            print(f'Quantile of {quantile}, B-factor = {bq}')
-            print(f'Quantile of {quantile}, resolution = {rq}')
+            error = {k: v.error_text() for k, v in (sketches or {}).items()}
+            print(f"Quantile of {quantile}, B-factor = {bq}{error.get('avg_bfactor', '')}")
+            print(f"Quantile of {quantile}, resolution = {rq}{error.get('resolution', '')}")
 
         # plt.yscale('log')
         # invert axis
@@ -152,15 +183,15 @@ class PlotPdb:
 
 
     def violin_equal_rmsd(self, ax):
-        sns.violinplot(self.df, y='chain_type', x='rmsd', ax=ax,
-            fill=False, color='black')
+        ViolinKDE.violinplot(self.df, y='chain_type', x='rmsd', ax=ax,
+            fill=False, color='black', cache=self.panel_cache)
         ax.set_xlabel('RMSD')
         ax.set_ylabel(None)
         ax.set_yticks([0,1,2], labels=['Heavy','Kappa','Lambda'])
         return ax
     
     def pie_equal_seq(self, ax, n:int=5):
-        equal_counts = self.df.groupby('first_chain_id').agg( num_equal= ('chain_id', len))
+        equal_counts = self.df.groupby('first_chain_id', observed=True).agg( num_equal= ('chain_id', len))
         equal_counts = equal_counts['num_equal'].value_counts()
         equal_counts = equal_counts.sort_index()
         counts = equal_counts[:n]
@@ -182,14 +213,20 @@ class PlotPdb:
         )
         return ax
 
-    def hist_rmsd(self, ax, chain_type):
+    def hist_rmsd(self, ax, chain_type, sketch=None):
+        '''
+        sketch: QuantileSketch of rmsd of the chain type
+        '''
         sub = self.df[self.df['chain_type']==chain_type].dropna()
         sns.histplot(sub, x='rmsd', ax=ax, bins=100, stat='percent', color='lightgrey')
         ax.set_xlim(-1,20)
         ax.set_ylim(0,30)
         ax.set_xlabel('RMSD')
         ax.set_ylabel('Percentage, %')
-        q = np.quantile(sub['rmsd'], .95)
+        if sketch is None:
+            q, error = np.quantile(sub['rmsd'], .95), ''
+        else:
+            q, error = sketch.quantile(.95), sketch.error_text()
         ax.axvline(q, color='grey', linestyle='--')
-        ax.text(q+1, 25, round(q, 2))
+        ax.text(q+1, 25, f"{round(q, 2)}{error}")
         return ax
\ No newline at end of file
@@ -1,21 +1,51 @@
 import numpy as np
-from numpy.polynomial.polynomial import polyfit
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy.stats import pearsonr
+from panel_cache import PanelCache
+from density import Density
+from group_stat import GroupStat
+from violin_kde import ViolinKDE
+from encoding import CodeBook
 
 class PlotPredict:
+    panel_cache = PanelCache()
+    # resamples of bootstrap intervals, 0: no intervals.
+    # opt in on the class or an instance, such as PlotPredict.n_boot = 200
+    n_boot = 0
 
     def __init__(self, df, verbose:bool=True):
         self.df = df
         self.verbose = verbose
-    
+
+    def stats(self, col1:str, col2:str, by=None, q:float=.95) -> pd.DataFrame:
+        '''
+        GroupStat.regress() of all groups, cached by the values of the columns
+        '''
+        cols = [col1, col2] + ([] if by is None else [by] if isinstance(by, str) else list(by))
+        params = {'col1': col1, 'col2': col2, 'by': by, 'q': q, 'n_boot': self.n_boot}
+        return self.panel_cache.compute('PlotPredict.stats', self.df[cols], params,
+            lambda: GroupStat.regress(self.df, col1, col2, by, q, self.n_boot), (GroupStat,))
+
+    def fit_data(self, col1:str, col2:str, chain_type:str=None, q:float=.95) -> pd.Series:
+        '''
+        statistics of one chain type or of all chains
+        q1: 1-q quantile of col1, q2: q quantile of col2
+        '''
+        if chain_type:
+            stat = self.stats(col1, col2, 'chain_type', q).loc[chain_type]
+        else:
+            stat = self.stats(col1, col2, None, q).iloc[0]
+        if self.verbose and 'slope_lo' in stat:
+            print(f"95% CI: slope [{stat['slope_lo']:.4f}, {stat['slope_hi']:.4f}], " + \
+                f"R2 [{stat['r2_lo']:.4f}, {stat['r2_hi']:.4f}]")
+        return stat
+
     def violin(self, ax, params):
         colx = params.get('colx')
         coly = params.get('coly')
-        sns.violinplot(self.df, x=colx, y=coly, ax=ax,
-            color='black', fill=False, inner='quart')
+        ViolinKDE.violinplot(self.df, x=colx, y=coly, ax=ax,
+            color='black', fill=False, inner='quart', cache=self.panel_cache)
         if 'xlabel' in params:
             ax.set_xlabel(params['xlabel'])
         if 'ylabel' in params:
@@ -25,17 +55,25 @@ class PlotPredict:
         ax.set_xticklabels(xtick_labels, rotation=45, ha='center')
 
         q = params.get('quantile', .95)
-        qval = np.quantile(self.df[coly], 1-q)
-        print(f'{q} quantile of {colx} is {qval}')
+        # params['sketch']: QuantileSketch of coly
+        sketch = params.get('sketch')
+        if sketch is None:
+            qval, error = np.quantile(self.df[coly], 1-q), ''
+        else:
+            qval, error = sketch.quantile(1-q), sketch.error_text()
+        print(f'{q} quantile of {colx} is {qval}{error}')
         ax.axhline(qval, linestyle='--')
         return ax
     
     def dot(self, ax, params):
+        '''
+        params['mode']: one of Density.modes, default 'points'
+        '''
         col1 = params.get('col1')
         col2 = params.get('col2')
         chain_type = params.get('chain_type')
         df = self.df[self.df['chain_type']==chain_type] if chain_type else self.df
-        sns.scatterplot(df, x=col1, y=col2, ax=ax,
+        Density.scatter(ax, df, col1, col2, params.get('mode', 'points'),
             color='black', alpha=.2, s=10)
         if 'xlabel' in params:
             ax.set_xlabel(params['xlabel'])
@@ -46,58 +84,65 @@ class PlotPredict:
         if 'ylim' in params:
             ax.set_ylabel(params['ylim'])
 
-        b, m = polyfit(df[col1], df[col2], 1)
+        stat = self.fit_data(col1, col2, chain_type)
+        b, m = stat['intercept'], stat['slope']
         print(f"intercept={b}, slope={m}")
-        ax.plot(df[col1], b+ m * df[col1], '-', color='grey')
-        coef, pval = pearsonr(df[col1], df[col2])
+        Density.fit_line(ax, df[col1], b, m, '-', color='grey')
+        coef = stat['pearson']
         ax.set_title(f"$R^2$ = {coef*coef:.4f}", fontsize=8)
         return ax
     
     def violin_plddt(self, ax):
-        sns.violinplot(self.df, y='chain_type', x='avg_plddt', ax=ax,
-            color='black', fill=False, inner='quart', split=True)
+        ViolinKDE.violinplot(self.df, y='chain_type', x='avg_plddt', ax=ax,
+            color='black', fill=False, inner='quart', split=True, cache=self.panel_cache)
         ax.set_xlabel('Average pLDDT')
         ax.set_ylabel(None)
         return ax
 
     def violin_ptm(self, ax):
-        sns.violinplot(self.df, y='chain_type', x='avg_ptm', ax=ax,
-            color='black', fill=False, inner='quart', split=True)
+        ViolinKDE.violinplot(self.df, y='chain_type', x='avg_ptm', ax=ax,
+            color='black', fill=False, inner='quart', split=True, cache=self.panel_cache)
         ax.set_xlabel('Average pTM')
         ax.set_ylabel(None)
         return ax
 
-    def dot_plddt_ptm(self, ax):
-        sns.scatterplot(self.df, x='avg_plddt', y='avg_ptm', hue='chain_type',
-            ax=ax, color='grey', alpha=.5, s=10)
-        sns.move_legend(ax, "upper left", bbox_to_anchor=(1,1))
+    def dot_plddt_ptm(self, ax, mode:str='points'):
+        '''
+        mode: one of Density.modes, chain types are merged by 'hexbin' and 'hist2d'
+        '''
+        df = CodeBook.observed(self.df[['avg_plddt', 'avg_ptm', 'chain_type']])
+        Density.scatter(ax, df, 'avg_plddt', 'avg_ptm', mode, hue='chain_type',
+            color='grey', alpha=.5, s=10)
+        if ax.get_legend() is not None:
+            sns.move_legend(ax, "upper left", bbox_to_anchor=(1,1))
         ax.set_xlabel('Average pLDDT')
         ax.set_ylabel('Average pTM')
         ax.set_xlim(60,100)
         ax.set_ylim(.5,1)
         return ax
 
-    def dot_chain_plddt_ptm(self, ax, chain_type):
+    def dot_chain_plddt_ptm(self, ax, chain_type, mode:str='points'):
         df = self.df[self.df['chain_type']==chain_type]
-        sns.scatterplot(df, x='avg_plddt', y='avg_ptm',
-            ax=ax, color='black', alpha=.5, s=10)
+        Density.scatter(ax, df, 'avg_plddt', 'avg_ptm', mode,
+            color='black', alpha=.5, s=10)
         ax.set_xlabel('Average pLDDT')
         ax.set_ylabel('Average pTM')
         ax.set_xlim(70,100)
         ax.set_ylim(.5,1)
 
-        b, m = polyfit(df['avg_plddt'], df['avg_ptm'], 1)
+        stat = self.fit_data('avg_plddt', 'avg_ptm', chain_type)
+        b, m = stat['intercept'], stat['slope']
         print(f"intercept={b}, slope={m}")
-        ax.plot(df['avg_plddt'], b+ m * df['avg_plddt'], '-', color='grey')
-        coef, pval = pearsonr(df['avg_plddt'], df['avg_ptm'])
+        Density.fit_line(ax, df['avg_plddt'], b, m, '-', color='grey')
+        coef = stat['pearson']
         ax.set_title(f"$R^2$={coef*coef:.4f}", fontsize=8)
         return ax
 
     def violin_pdb_rmsd(self, ax):
         self.df['rmsd_adj'] = self.df['rmsd'] + 1e-5
 
-        sns.violinplot(self.df, x='chain_status', y='rmsd_adj', ax=ax,
-            log_scale=True, inner='quart', color='black', fill=False)
+        ViolinKDE.violinplot(self.df, x='chain_status', y='rmsd_adj', ax=ax,
+            log_scale=True, inner='quart', color='black', fill=False, cache=self.panel_cache)
         ax.set_xlim(-.6, 2.5)
         ax.set_xlabel('PDB Post-processing')
         ax.set_ylabel('Log RMSD')
@@ -116,8 +161,8 @@ class PlotPredict:
     
 
     def violin_pdb_tm(self, ax):
-        sns.violinplot(self.df, x='chain_status', y='tm1', ax=ax,
-            log_scale=True, color='black', fill=False)
+        ViolinKDE.violinplot(self.df, x='chain_status', y='tm1', ax=ax,
+            log_scale=True, color='black', fill=False, cache=self.panel_cache)
         ax.set_xlim(-.6, 2.5)
         ax.set_ylim(-.1, 1.4)
         ax.set_xlabel('PDB Post-processing')
@@ -125,12 +170,15 @@ class PlotPredict:
         ax.axhline(1, linestyle='--', color='grey')
         return ax
 
-    def dot_plddt_rmsd(self, ax, chain_type=None, q=.95):
+    def dot_plddt_rmsd(self, ax, chain_type=None, q=.95, mode:str='points'):
+        '''
+        mode: one of Density.modes
+        '''
         sdf = self.df[self.df['chain_type']==chain_type] if chain_type else self.df
         
         col1 = 'avg_plddt'
         col2 = 'rmsd'
-        sns.scatterplot(sdf, x=col1, y=col2, ax=ax,
+        Density.scatter(ax, sdf, col1, col2, mode,
             alpha=.1, color='black', s=10)
         ax.set_xlabel('Average pLDDT')
         ax.set_ylabel('RMSD')
@@ -139,73 +187,78 @@ class PlotPredict:
         # ax.invert_yaxis()
 
         # fit
-        b, m = polyfit(sdf[col1], sdf[col2], 1)
+        stat = self.fit_data(col1, col2, chain_type, q)
+        b, m = stat['intercept'], stat['slope']
         print(f"intercept={b}, slop={m}")
-        ax.plot(sdf[col1], b + m * sdf[col1], '-', color='blue')
-        coef, p_value = pearsonr(sdf[col1], sdf[col2])
+        Density.fit_line(ax, sdf[col1], b, m, '-', color='blue')
+        coef = stat['pearson']
         ax.set_title(f"$R^2$ = {coef*coef:.2f}")
 
         # quantile
-        q1 = np.quantile(sdf[col1], 1-q)
+        q1 = stat['q1']
         print(f"{q} quantile of {col1} is {q1:.2f}")
         ax.axvline(q1, linestyle='--', color='grey')
-        q2 = np.quantile(sdf[col2], q)
+        q2 = stat['q2']
         print(f"{q} quantile of {col2} is {q2:.2f}")
         ax.axhline(q2, linestyle='--', color='grey')
         return ax
 
-    def dot_plddt_tm(self, ax, chain_type=None, q=.95):
+    def dot_plddt_tm(self, ax, chain_type=None, q=.95, mode:str='points'):
+        '''
+        mode: one of Density.modes
+        '''
         sdf = self.df[self.df['chain_type']==chain_type] \
             if chain_type else self.df
         
-        sns.scatterplot(sdf, x='avg_plddt', y='tm1', ax=ax,
+        Density.scatter(ax, sdf, 'avg_plddt', 'tm1', mode,
             alpha=.1, color='black', s=10)
         ax.set_xlabel('Average pLDDT')
         ax.set_ylabel('TM-align')
         ax.set_xlim(60, 100)
 
         # fit
-        b, m = polyfit(sdf['avg_plddt'], sdf['tm1'], 1)
+        stat = self.fit_data('avg_plddt', 'tm1', chain_type, q)
+        b, m = stat['intercept'], stat['slope']
         print(f"intercept={b}, coef={m}")
-        ax.plot(sdf['avg_plddt'], b + m * sdf['avg_plddt'],
-            '-', color='blue')
-        coef, p_value = pearsonr(sdf['avg_plddt'], sdf['tm1'])
+        Density.fit_line(ax, sdf['avg_plddt'], b, m, '-', color='blue')
+        coef = stat['pearson']
         ax.set_title(f"$R^2$ = {coef*coef:.2f}")
 
         # quantile
-        q_plddt = np.quantile(sdf['avg_plddt'], 1-q)
+        q_plddt = stat['q1']
         print(q_plddt)
         ax.axvline(q_plddt, linestyle='--', color='grey')
-        q_tm = np.quantile(sdf['tm1'], q)
+        q_tm = stat['q2']
         print(q_tm)
         ax.axhline(q_tm, linestyle='--', color='grey')
         return ax
     
-    def dot_plddt_rmsd2(self, ax, chain_type=None, q=.95):
+    def dot_plddt_rmsd2(self, ax, chain_type=None, q=.95, mode:str='points'):
         sdf = self.df[self.df['chain_type']==chain_type] \
             if chain_type else self.df
         
         col1 = 'avg_plddt'
         col2 = 'rmsd'
-        sns.scatterplot(sdf, x=col1, y=col2, ax=ax,
+        Density.scatter(ax, sdf, col1, col2, mode,
             alpha=.1, color='black', s=10)
         ax.set_xlim(60, 100)
         ax.set_xlabel('average pLDDT')
         ax.set_ylabel('RMSD')
 
         # fit
-        b, m = polyfit(sdf[col1], sdf[col2], 1)
+        stat = self.fit_data(col1, col2, chain_type, q)
+        b, m = stat['intercept'], stat['slope']
         print(f"intercept={b}, coef={m}")
-        ax.plot(sdf[col1], b + m * sdf[col1], '-', color='blue')
-        coef, p_value = pearsonr(sdf[col1], sdf[col2])
+        Density.fit_line(ax, sdf[col1], b, m, '-', color='blue')
+        coef = stat['pearson']
         ax.text(60, b+m*60, round(coef*coef,2))
         ax.invert_yaxis()
 
         # quantile
-        q_plddt = np.quantile(sdf[col1], 1-q)
+        q_plddt = stat['q1']
         print(q_plddt)
         ax.axvline(q_plddt, linestyle='--', color='grey')
-        q2 = np.quantile(sdf[col2], q)
+        q2 = stat['q2']
         print(q2)
         ax.axhline(q2, linestyle='--', color='grey')
         return ax
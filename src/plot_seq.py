@@ -2,18 +2,89 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from encoding import CodeBook
 
 class PlotSeq:
+    # columns counted in the cube
+    cube_keys = ('gene_name', 'allele_name', 'chain_seq')
 
     def __init__(self, df:pd.DataFrame, verbose:bool=True):
         self.df = df
         self.verbose = verbose
+        self._cube = None
+        self._tops = {}
 
-    def pie_specie_counts(self, ax, params):
+    @property
+    def cube(self) -> dict:
+        '''
+        {(specie, chain_type): {'size': number of chains, key: value counts}}
+        of PlotSeq.cube_keys, built in one pass over self.df
+        '''
+        if self._cube is None:
+            self._cube = {}
+            groups = self.df.groupby(['specie', 'chain_type'], sort=True, observed=True)
+            for group, cdf in groups:
+                cell = {'size': len(cdf)}
+                for key in self.cube_keys:
+                    cell[key] = self.observed_counts(cdf[key])
+                self._cube[group] = cell
+        return self._cube
+
+    @staticmethod
+    def observed_counts(s:pd.Series) -> pd.Series:
+        '''
+        value counts without unused categories of compact frames,
+        such as CodeBook.compact()
+        '''
+        values = s.value_counts()
+        values = values[values > 0]
+        if isinstance(values.index.dtype, pd.CategoricalDtype):
+            values.index = values.index.astype(object)
+        return values
+
+    def value_counts(self, specie, chain_type:str, key:str) -> pd.Series:
+        cell = self.cube.get((specie, chain_type))
+        if cell is None:
+            return self.observed_counts(self.df[key].iloc[:0])
+        return cell[key]
+
+    def top_counts(self, specie, chain_type:str, key:str, topn:int, others:bool=True) -> pd.DataFrame:
+        '''
+        top n values and the rest rolled up into 'Others'
+        columns: key, count
+        '''
+        tag = (specie, chain_type, key, topn, others)
+        if tag not in self._tops:
+            values = self.value_counts(specie, chain_type, key)
+            counts = values.iloc[:topn].reset_index()
+            other = values.iloc[topn:].sum()
+            if others and other > 0:
+                counts.loc[len(counts)] = ['Others', other]
+            self._tops[tag] = counts
+        return self._tops[tag].copy()
+
+    def nunique(self, specie, key:str) -> pd.DataFrame:
+        '''
+        number of unique values by chain_type of one specie
+        columns: chain_type, key
+        '''
+        rows = [(chain_type, len(cell[key])) for (_specie, chain_type), cell \
+            in self.cube.items() if _specie == specie]
+        return pd.DataFrame(rows, columns=['chain_type', key])
+
+    def specie_size(self, specie) -> int:
+        return sum(cell['size'] for (_specie, _), cell in self.cube.items() \
+            if _specie == specie)
+
+    def pie_specie_counts(self, ax, params, values:pd.DataFrame=None):
+        '''
+        values: number of chains by specie, such as LoadData.specie_counts()
+        '''
         # counts
-        cdf = self.df[self.df['specie'].notna()]
-        values = cdf['specie'].value_counts()
-        values = values.reset_index()
+        if values is None:
+            cdf = self.df[self.df['specie'].notna()]
+            values = self.observed_counts(cdf['specie'])
+            values = values.reset_index()
         topn = params['n']
         counts = pd.DataFrame(values.iloc[:topn,:])
         other = sum(values['count'][topn:])
@@ -45,11 +116,15 @@ class PlotSeq:
         texts[1].set_position(((-.9, -.2)))
         return ax
 
-    def table_species(self, ax, params):
+    def table_species(self, ax, params, values:pd.DataFrame=None):
+        '''
+        values: number of chains by specie, such as LoadData.specie_counts()
+        '''
         # counts
-        cdf = self.df[self.df['specie'].notna()]
-        values = cdf['specie'].value_counts()
-        values = values.reset_index()
+        if values is None:
+            cdf = self.df[self.df['specie'].notna()]
+            values = self.observed_counts(cdf['specie'])
+            values = values.reset_index()
         topn = params.get('n', 0)
 
         # other counts
@@ -80,13 +155,13 @@ class PlotSeq:
         return ax
 
     def plot_summary(self, n):
-        top_names = list(self.df['specie'].value_counts()[:n].index)
+        top_names = list(self.observed_counts(self.df['specie'])[:n].index)
         if self.verbose:
             print(top_names)
-        sdf = self.df[self.df['specie'].isin(top_names)]
+        sdf = CodeBook.observed(self.df[self.df['specie'].isin(top_names)])
 
         # count numbers
-        counts = sdf.groupby(['specie', 'chain_type']).agg({'chain_seq': len})
+        counts = sdf.groupby(['specie', 'chain_type'], observed=True).agg({'chain_seq': len})
         counts = counts.reset_index()
         counts = counts.pivot(index='chain_type', columns='specie', values='chain_seq')
         
@@ -103,11 +178,9 @@ class PlotSeq:
    
     def bar_gene_family(self, ax, params):
         specie = params['specie']
-        sdf = self.df[self.df['specie']==specie]
         if self.verbose:
-            print(sdf.shape)
-        g = sdf.groupby('chain_type').agg({'gene_name':'nunique'})
-        g = g.reset_index()
+            print(f"{specie}, number of chains: {self.specie_size(specie)}")
+        g = self.nunique(specie, 'gene_name')
 
         # barplot
         sns.barplot(g, x='chain_type', y ='gene_name', ax=ax, color='grey')
@@ -121,11 +194,9 @@ class PlotSeq:
 
     def bar_allele_name(self, ax, params):
         specie = params['specie']
-        sdf = self.df[self.df['specie']==specie]
         if self.verbose:
-            print(sdf.shape)
-        g = sdf.groupby('chain_type').agg({'allele_name':'nunique'})
-        g = g.reset_index()
+            print(f"{specie}, number of chains: {self.specie_size(specie)}")
+        g = self.nunique(specie, 'allele_name')
 
         # barplot
         sns.barplot(g, x='chain_type', y ='allele_name', ax=ax, color='grey')
@@ -139,11 +210,9 @@ class PlotSeq:
     
     def bar_chain_seq(self, ax, params):
         specie = params['specie']
-        sdf = self.df[self.df['specie']==specie]
         if self.verbose:
-            print(sdf.shape)
-        g = sdf.groupby('chain_type').agg({'chain_seq':'nunique'})
-        g = g.reset_index()
+            print(f"{specie}, number of chains: {self.specie_size(specie)}")
+        g = self.nunique(specie, 'chain_seq')
 
         # barplot
         sns.barplot(g, x='chain_type', y ='chain_seq', ax=ax, color='grey')
@@ -157,7 +226,7 @@ class PlotSeq:
 
     def box_chain_len(self, ax, params):
         specie = params['specie']
-        sdf = self.df[self.df['specie']==specie]
+        sdf = CodeBook.observed(self.df[self.df['specie']==specie])
         if self.verbose:
             print(sdf.shape)
 
@@ -173,6 +242,7 @@ class PlotSeq:
             sdf = sdf[sdf['pro_len']>=params['min_len']]
         if 'max_len' in params:
             sdf = sdf[sdf['pro_len']<params['max_len']]
+        sdf = CodeBook.observed(sdf)
         if self.verbose:
             print(sdf.shape)
 
@@ -182,14 +252,8 @@ class PlotSeq:
         return ax
        
     def pie_specie_chain(self, ax, specie, chain_type:str, key:str, topn:int, params):
-        cdf = self.df[(self.df['specie']==specie)&(self.df['chain_type']==chain_type)]
-        values = cdf[key].value_counts()
-        values = values.reset_index()
-        counts = pd.DataFrame(values.iloc[:topn,:])
-        other = sum(values['count'][topn:])
-        if other > 0:
-            topn += 1
-            counts.loc[topn] = ['Others', other]
+        counts = self.top_counts(specie, chain_type, key, topn)
+        topn = len(counts)
         if self.verbose:
             print(f"{specie}, number of pies: {len(counts)}")
 
@@ -217,28 +281,18 @@ class PlotSeq:
         return ax
 
     def table_specie_chain(self, ax, specie, chain_type:str, key:str, topn:int):
-        cdf = self.df[(self.df['specie']==specie)&(self.df['chain_type']==chain_type)]
-        values = cdf[key].value_counts()
-        values = values.reset_index()
-        counts = pd.DataFrame(values.iloc[:topn,:])
-        other = sum(values['count'][topn:])
-        if other > 0:
-            topn += 1
-            counts.loc[topn] = ['Others', other]
+        counts = self.top_counts(specie, chain_type, key, topn)
 
         # add table
-        topn += 1
-        counts.loc[topn] = ['Total', sum(values['count'])]
+        total = self.value_counts(specie, chain_type, key).sum()
+        counts.loc[len(counts)] = ['Total', total]
         ax.axis('off')
         table = pd.plotting.table(ax, counts, loc="center", cellLoc="left", \
             colWidths=[0.5,]*counts.shape[1])
         return ax
 
     def bar_specie_chain(self, ax, specie, chain_type:str, key:str, topn:int, params):
-        cdf = self.df[(self.df['specie']==specie)&(self.df['chain_type']==chain_type)]
-        values = cdf[key].value_counts()
-        values = values.reset_index()
-        counts = pd.DataFrame(values.iloc[:topn,:])
+        counts = self.top_counts(specie, chain_type, key, topn, others=False)
         counts['percent'] = counts['count'] * 100 /sum(counts['count'])
         if self.verbose:
             print(counts)
@@ -1,17 +1,33 @@
-
+import tempfile
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from venny4py.venny4py import venny4py
 from matplotlib.patches import Circle
+from set_membership import SetMembership
 
 class PlotVenn:
 
     @staticmethod
-    def venn_chain(sets, ax, labels_xy):
+    def venn_chain(sets, ax, labels_xy, out:str='./'):
+        '''
+        sets: {name: identifiers} of 2 to 4 sets
+        out: directory of the file of region members
+        '''
+        membership = SetMembership(sets)
+        membership.write(out)
+        # venny4py draws one token per region, numbers are replaced by counts
+        names = membership.names
+        tokens = {name: {j for j in range(1, 2 ** len(names)) if j >> i & 1} \
+            for i, name in enumerate(names)}
         colors = ['grey',] * len(sets)
-        venny4py(sets=sets, size=3, colors=colors, edge_color='black',
-            column_spacing=2, line_width=.5, dpi=300, asax=ax)
+        num_texts = len(ax.texts)
+        with tempfile.TemporaryDirectory() as tmp:
+            venny4py(sets=tokens, out=tmp, size=3, colors=colors, edge_color='black',
+                column_spacing=2, line_width=.5, dpi=300, asax=ax)
+        numbers = membership.sizes() + list(membership.regions().values())
+        for text, n in zip(ax.texts[num_texts:], numbers):
+            text.set_text(n)
         # set labels
         legend = ax.legend()
         legend.set_visible(False)
@@ -19,4 +35,4 @@ class PlotVenn:
             x, y = labels_xy[i]
             label = list(sets)[i]
             ax.text(x, y, label, fontsize=10)
-        return ax
\ No newline at end of file
+        return ax
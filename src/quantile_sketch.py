@@ -0,0 +1,134 @@
+'''
+mergeable quantile sketch of streamed values
+'''
+import numpy as np
+
+
+class QuantileSketch:
+    '''
+    KLL-style compactors: level h keeps at most k values of weight 2**h.
+    a full level is sorted and every other value, from a random offset, is
+    promoted to the next level.
+
+    error bound: a compaction at weight w moves the rank of any value by
+    0 or +-w with equal chance, so by Hoeffding, with probability 1-delta,
+        |rank error| <= sqrt(2 * ln(2/delta) * sum(w**2))
+    rank_error() returns it divided by n, about 4.6/k at delta=.01.
+    quantiles are exact until more than k values were added
+
+    sketches of chunks or of worker processes are combined by merge()
+    '''
+
+    def __init__(self, k:int=1000, seed:int=None):
+        self.k = k
+        self.levels = []
+        self.n = 0
+        # sum of squared weights of compactions
+        self.sq = 0.
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    def update(self, values) -> 'QuantileSketch':
+        '''
+        add values, NaN are skipped
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        if not self.levels:
+            self.levels.append(values)
+        else:
+            self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                # an odd value stays at this level
+                m = len(level) - len(level) % 2
+                promoted = level[:m][self.rng.integers(2)::2]
+                self.levels[h] = level[m:]
+                self.sq += float(2**h) ** 2
+                if h + 1 == len(self.levels):
+                    self.levels.append(promoted)
+                else:
+                    self.levels[h+1] = np.concatenate([self.levels[h+1], promoted])
+            h += 1
+
+    def merge(self, other:'QuantileSketch') -> 'QuantileSketch':
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(level.copy())
+            else:
+                self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.sq += other.sq
+        self.compress()
+        return self
+
+    def weighted(self) -> tuple:
+        '''
+        sorted values and their weights
+        '''
+        if not self.levels:
+            return np.zeros(0), np.zeros(0)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.**h) \
+            for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        '''
+        q: float or array. Same as np.quantile() while exact
+        '''
+        values, weights = self.weighted()
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if self.sq == 0:
+            return np.quantile(values, q)
+        cum = np.cumsum(weights)
+        i = np.searchsorted(cum, np.asarray(q) * cum[-1], side='left')
+        return values[np.minimum(i, len(values) - 1)]
+
+    def rank_error(self, delta:float=.01) -> float:
+        '''
+        bound of |rank error| / n with probability 1-delta
+        '''
+        if self.n == 0:
+            return 0.
+        return float(np.sqrt(2 * np.log(2 / delta) * self.sq) / self.n)
+
+    def interval(self, q:float, delta:float=.01) -> tuple:
+        '''
+        values at q -+ rank_error(), the true q quantile is between them
+        '''
+        eps = self.rank_error(delta)
+        return self.quantile(max(0., q - eps)), self.quantile(min(1., q + eps))
+
+    def error_text(self, delta:float=.01) -> str:
+        '''
+        label of the bound shown next to threshold lines, empty if exact
+        '''
+        eps = self.rank_error(delta)
+        return f" (rank ±{eps:.1%})" if eps > 0 else ''
+
+    @staticmethod
+    def of(values, k:int=1000, seed:int=None) -> 'QuantileSketch':
+        return QuantileSketch(k, seed).update(values)
+
+    @staticmethod
+    def merge_all(sketches) -> 'QuantileSketch':
+        sketches = list(sketches)
+        res = QuantileSketch(sketches[0].k if sketches else 1000)
+        for sketch in sketches:
+            res.merge(sketch)
+        return res
@@ -0,0 +1,155 @@
+'''
+on-disk cache of query results and in-memory store of shared tables
+'''
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+# parquet needs pyarrow or fastparquet, otherwise compressed pickle
+FORMATS = ('parquet', 'pkl.gz')
+
+
+def default_dir() -> str:
+    return os.environ.get('PREDICT_ANTIBODY_CACHE',
+        os.path.join(os.path.expanduser('~'), '.cache', 'predict_antibody'))
+
+
+def find_frame(stem:str):
+    '''
+    path of a stored DataFrame, stem is the path without extension
+    '''
+    for fmt in FORMATS:
+        path = f"{stem}.{fmt}"
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def read_frame(path:str) -> pd.DataFrame:
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def write_frame(stem:str, df:pd.DataFrame) -> str:
+    # write a temporary file then rename, safe for concurrent writers
+    tmp = f"{stem}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(tmp, compression='zstd', index=False)
+        path = f"{stem}.parquet"
+    except (ImportError, ValueError, TypeError):
+        # no parquet engine or columns of mixed types
+        df.to_pickle(tmp, compression='gzip')
+        path = f"{stem}.pkl.gz"
+    os.replace(tmp, path)
+    # drop the stale copy in the other format
+    for fmt in FORMATS:
+        if f"{stem}.{fmt}" != path and os.path.isfile(f"{stem}.{fmt}"):
+            os.remove(f"{stem}.{fmt}")
+    return path
+
+
+class QueryCache:
+    formats = FORMATS
+
+    def __init__(self, cache_dir:str=None, ttl:float=86400, verbose:bool=False):
+        '''
+        ttl: seconds before a cached result expires. None: never expire
+        '''
+        self.cache_dir = cache_dir or default_dir()
+        self.ttl = ttl
+        self.verbose = verbose
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def normalize(query:str) -> str:
+        query = re.sub(r'\s+', ' ', query).strip()
+        return query.rstrip(';').strip()
+
+    def key(self, query:str, params:dict=None) -> str:
+        text = json.dumps([self.normalize(query), params or {}],
+            sort_keys=True, default=str)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def get(self, query:str, params:dict=None):
+        '''
+        return None if not cached or expired
+        '''
+        path = find_frame(os.path.join(self.cache_dir, self.key(query, params)))
+        if path is None:
+            return None
+        if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+            os.remove(path)
+            return None
+        if self.verbose:
+            print('cached:', path)
+        return read_frame(path)
+
+    def put(self, query:str, df:pd.DataFrame, params:dict=None) -> str:
+        stem = os.path.join(self.cache_dir, self.key(query, params))
+        return write_frame(stem, df)
+
+    def invalidate(self, query:str=None, params:dict=None) -> int:
+        '''
+        remove one query or all queries if query is None
+        '''
+        if query is None:
+            keys = None
+        else:
+            keys = [self.key(query, params)]
+        n = 0
+        for name in os.listdir(self.cache_dir):
+            key, _, fmt = name.partition('.')
+            if fmt in self.formats and (keys is None or key in keys):
+                os.remove(os.path.join(self.cache_dir, name))
+                n += 1
+        if self.verbose:
+            print('invalidate cache:', n)
+        return n
+
+    def clear(self) -> int:
+        return self.invalidate()
+
+
+class MemoryCache:
+    '''
+    in-process store of shared tables
+    evict the least recently used beyond maxsize, or entries older than ttl
+    '''
+
+    def __init__(self, maxsize:int=8, ttl:float=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+    def get(self, key):
+        if key not in self.data:
+            return None
+        value, stamp = self.data[key]
+        if self.ttl is not None and time.time() - stamp > self.ttl:
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.data[key] = (value, time.time())
+        self.data.move_to_end(key)
+        while self.maxsize is not None and len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+        return value
+
+    def refresh(self, key=None) -> int:
+        '''
+        drop one entry or all entries if key is None
+        '''
+        if key is None:
+            n = len(self.data)
+            self.data.clear()
+            return n
+        return 1 if self.data.pop(key, None) is not None else 0
@@ -0,0 +1,81 @@
+'''
+index of IMGT regions by (pdb_id, chain_no, region_name)
+'''
+import numpy as np
+import pandas as pd
+
+
+class RegionIndex:
+    '''
+    rows of one key are contiguous after sorting, so a key points to a
+    range of rows. Lookups hash the key, no DataFrame is built per group.
+    vg[key] returns the rows like dict(tuple(df.groupby(keys)))[key]
+    '''
+    keys = ['pdb_id', 'chain_no', 'region_name']
+
+    def __init__(self, df:pd.DataFrame):
+        # keep the original index like groupby()
+        df = df.sort_values(self.keys, kind='stable')
+        self.df = df
+        mi = pd.MultiIndex.from_frame(df[self.keys])
+        first = ~mi.duplicated()
+        self.index = mi[first]
+        self.starts = np.flatnonzero(first)
+        self.ends = np.append(self.starts[1:], len(df))
+        # regions of one chain are contiguous too
+        chains = mi.droplevel('region_name')
+        first = ~chains.duplicated()
+        self.chain_index = chains[first]
+        self.chain_starts = np.flatnonzero(first)
+        self.chain_ends = np.append(self.chain_starts[1:], len(df))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def __getitem__(self, key) -> pd.DataFrame:
+        i = self.index.get_loc(key)
+        return self.df.iloc[self.starts[i]:self.ends[i]]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def chain(self, pdb_id, chain_no) -> pd.DataFrame:
+        '''
+        all regions of one chain, None if not found
+        '''
+        key = (pdb_id, chain_no)
+        if key not in self.chain_index:
+            return None
+        i = self.chain_index.get_loc(key)
+        return self.df.iloc[self.chain_starts[i]:self.chain_ends[i]]
+
+    def lookup(self, keys) -> np.ndarray:
+        '''
+        first row of every key, -1 if not found
+        keys: list of tuples or DataFrame with columns of RegionIndex.keys
+        '''
+        if isinstance(keys, pd.DataFrame):
+            keys = pd.MultiIndex.from_frame(keys[self.keys])
+        else:
+            keys = pd.MultiIndex.from_tuples(list(keys), names=self.keys)
+        i = self.index.get_indexer(keys)
+        return np.where(i >= 0, self.starts[i], -1)
+
+    def take(self, keys) -> pd.DataFrame:
+        '''
+        first row of every key found
+        '''
+        rows = self.lookup(keys)
+        return self.df.iloc[rows[rows >= 0]]
+
+    def first(self, region_names=None) -> pd.DataFrame:
+        '''
+        one row per key, such as the region bounds used by scan_regions()
+        '''
+        df = self.df.iloc[self.starts]
+        if region_names is not None:
+            df = df[df['region_name'].isin(region_names)]
+        return df.reset_index(drop=True)
@@ -0,0 +1,79 @@
+'''
+regions of overlapping sets from bit masks of encoded identifiers
+'''
+import os
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+
+class SetMembership:
+    '''
+    identifiers are encoded once, bit i of the mask of an identifier is set
+    if it is in set i. region r of the Venn diagram holds the identifiers
+    whose mask is r, so all 2**k region counts are one np.bincount()
+    '''
+    max_sets = 8
+
+    def __init__(self, sets:dict):
+        '''
+        sets: {name: identifiers}, such as python sets or Series of chain ids
+        '''
+        if not 0 < len(sets) <= self.max_sets:
+            raise ValueError(f"Number of sets must be 1 to {self.max_sets}")
+        self.names = list(sets)
+        values = [np.asarray(s.to_numpy() if hasattr(s, 'to_numpy') else list(s),
+            dtype=object) for s in sets.values()]
+        codes, self.keys = pd.factorize(np.concatenate(values))
+        self.masks = np.zeros(len(self.keys), dtype=np.uint8)
+        start = 0
+        for i, v in enumerate(values):
+            # duplicated identifiers set the same bit
+            self.masks[codes[start:start+len(v)]] |= np.uint8(1 << i)
+            start += len(v)
+        self.counts = np.bincount(self.masks, minlength=2 ** len(self.names))
+
+    def sizes(self) -> list:
+        '''
+        number of identifiers in every set
+        '''
+        regions = np.arange(len(self.counts))
+        return [int(self.counts[(regions >> i) & 1 == 1].sum()) \
+            for i in range(len(self.names))]
+
+    def mask(self, names) -> int:
+        return sum(1 << self.names.index(name) for name in names)
+
+    def combos(self) -> list:
+        '''
+        names of all non-empty regions, ordered like venny4py
+        '''
+        return [comb for i in range(1, len(self.names) + 1) \
+            for comb in combinations(self.names, i)]
+
+    def regions(self) -> dict:
+        '''
+        {'A and B': number of identifiers in A and B only}
+        '''
+        return {' and '.join(comb): int(self.counts[self.mask(comb)]) \
+            for comb in self.combos()}
+
+    def members(self) -> dict:
+        '''
+        {'A and B': sorted identifiers in A and B only}
+        '''
+        order = np.argsort(self.masks, kind='stable')
+        groups = np.split(self.keys[order], np.cumsum(self.counts)[:-1])
+        return {' and '.join(comb): sorted(groups[self.mask(comb)]) \
+            for comb in self.combos()}
+
+    def write(self, out:str='./') -> str:
+        '''
+        counts and identifiers of regions, the same file as venny4py
+        '''
+        os.makedirs(out, exist_ok=True)
+        outfile = os.path.join(out, f'Intersections_{len(self.names)}.txt')
+        with open(outfile, 'w') as f:
+            for k, v in self.members().items():
+                f.write(f'{k}: {len(v)}, {v}\n')
+        return outfile
@@ -0,0 +1,108 @@
+'''
+DataFrames shared by processes through memory-mapped columns
+'''
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+
+
+class SharedFrames:
+    '''
+    files in share_dir/<name>:
+        meta.json: columns, kinds and the index
+        <i>.npy: values of numeric column i, memory-mapped by readers
+        <i>.npy and <i>.pkl: codes and dictionary of other columns
+    pages of the numeric columns are shared by all processes reading them
+    '''
+
+    def __init__(self, share_dir:str):
+        self.share_dir = share_dir
+
+    @staticmethod
+    def kind(s:pd.Series) -> str:
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            return 'category'
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in 'biufcmM':
+            return 'array'
+        return 'codes'
+
+    def write(self, name:str, df:pd.DataFrame) -> str:
+        frame_dir = os.path.join(self.share_dir, name)
+        if os.path.isdir(frame_dir):
+            shutil.rmtree(frame_dir)
+        os.makedirs(frame_dir)
+        index, index_names = None, None
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            index_names = list(df.index.names)
+            index = [f"__index_{i}__" for i in range(len(index_names))]
+            df = df.rename_axis(index).reset_index()
+
+        cols = []
+        for i, col in enumerate(df.columns):
+            s = df.iloc[:, i]
+            kind = self.kind(s)
+            path = os.path.join(frame_dir, str(i))
+            if kind == 'array':
+                np.save(f"{path}.npy", s.to_numpy())
+            elif kind == 'category':
+                np.save(f"{path}.npy", s.cat.codes.to_numpy())
+                with open(f"{path}.pkl", 'wb') as f:
+                    pickle.dump(s.dtype, f)
+            else:
+                codes, uniques = pd.factorize(s)
+                codes = codes.astype(np.int32) if len(uniques) < 2**31 else codes
+                np.save(f"{path}.npy", codes)
+                with open(f"{path}.pkl", 'wb') as f:
+                    pickle.dump(uniques, f)
+            cols.append({'name': col, 'kind': kind})
+        with open(os.path.join(frame_dir, 'meta.json'), 'w') as f:
+            json.dump({'columns': cols, 'index': index, 'index_names': index_names, \
+                'rows': len(df)}, f, default=str)
+        return frame_dir
+
+    def read(self, name:str) -> pd.DataFrame:
+        '''
+        numeric columns are copy-on-write memory maps, changes stay private
+        '''
+        frame_dir = os.path.join(self.share_dir, name)
+        with open(os.path.join(frame_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        data = {}
+        for i, col in enumerate(meta['columns']):
+            path = os.path.join(frame_dir, str(i))
+            values = np.load(f"{path}.npy", mmap_mode='c')
+            if col['kind'] != 'array':
+                with open(f"{path}.pkl", 'rb') as f:
+                    dictionary = pickle.load(f)
+                if col['kind'] == 'category':
+                    values = pd.Categorical.from_codes(values, dtype=dictionary)
+                else:
+                    values = dictionary.take(values, allow_fill=True, \
+                        fill_value=np.nan).array
+            data[i] = values
+        df = pd.DataFrame(data, copy=False)
+        df.columns = [col['name'] for col in meta['columns']]
+        if meta['index']:
+            df = df.set_index(meta['index'])
+            df.index.names = meta['index_names']
+        return df
+
+    def names(self) -> list:
+        return sorted(name for name in os.listdir(self.share_dir) \
+            if os.path.isfile(os.path.join(self.share_dir, name, 'meta.json')))
+
+    def read_all(self) -> dict:
+        return {name: self.read(name) for name in self.names()}
+
+    @staticmethod
+    def share(frames:dict, share_dir:str) -> 'SharedFrames':
+        '''
+        frames: {name: DataFrame}
+        '''
+        shared = SharedFrames(share_dir)
+        for name, df in frames.items():
+            shared.write(name, df)
+        return shared
@@ -0,0 +1,62 @@
+'''
+local snapshot of a table refreshed by a high-water mark
+'''
+import json
+import os
+import pandas as pd
+from query_cache import default_dir, find_frame, read_frame, write_frame
+
+
+class Snapshot:
+
+    def __init__(self, name:str, key:list, watermark:str, snapshot_dir:str=None):
+        '''
+        key: columns identifying a row, new rows replace old rows of the same key
+        watermark: column increasing with new or changed rows,
+            such as release_date or an auto-increment id
+        '''
+        self.name = name
+        self.key = [key] if isinstance(key, str) else list(key)
+        self.watermark = watermark
+        self.snapshot_dir = snapshot_dir or os.path.join(default_dir(), 'snapshots')
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self.stem = os.path.join(self.snapshot_dir, name)
+
+    @property
+    def meta_file(self) -> str:
+        return f"{self.stem}.json"
+
+    def load(self) -> tuple:
+        '''
+        return (DataFrame, high-water mark), (None, None) if not created
+        '''
+        path = find_frame(self.stem)
+        if path is None or not os.path.isfile(self.meta_file):
+            return None, None
+        with open(self.meta_file) as f:
+            meta = json.load(f)
+        return read_frame(path), meta.get('watermark')
+
+    def save(self, df:pd.DataFrame) -> str:
+        mark = df[self.watermark].max() if len(df) else None
+        mark = None if pd.isna(mark) else str(mark)
+        write_frame(self.stem, df)
+        with open(self.meta_file, 'w') as f:
+            json.dump({'watermark': mark, 'rows': len(df)}, f)
+        return mark
+
+    def merge(self, df:pd.DataFrame, new:pd.DataFrame) -> pd.DataFrame:
+        '''
+        upsert new rows by key
+        '''
+        if df is None or len(df) == 0:
+            return new.reset_index(drop=True)
+        if len(new) == 0:
+            return df
+        merged = pd.concat([df, new], ignore_index=True)
+        return merged.drop_duplicates(self.key, keep='last').reset_index(drop=True)
+
+    def clear(self):
+        for path in (find_frame(self.stem), self.meta_file):
+            if path and os.path.isfile(path):
+                os.remove(path)
@@ -0,0 +1,58 @@
+'''
+counts of value pairs in a sparse matrix, only top blocks are dense
+'''
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class SparseCrosstab:
+    '''
+    rows and columns are integer codes of their values, so the memory is
+    O(number of distinct pairs), not rows x columns like pivot(). such as
+    CDR3 sequences x genes
+    '''
+
+    def __init__(self, df:pd.DataFrame, row_name:str, col_name:str):
+        row_codes, self.row_keys = pd.factorize(df[row_name], sort=True)
+        col_codes, self.col_keys = pd.factorize(df[col_name], sort=True)
+        self.row_name, self.col_name = row_name, col_name
+        # missing values are skipped like groupby()
+        keep = (row_codes >= 0) & (col_codes >= 0)
+        row_codes, col_codes = row_codes[keep], col_codes[keep]
+        shape = (len(self.row_keys), len(self.col_keys))
+        # duplicated pairs are summed by tocsr()
+        self.matrix = sparse.coo_matrix((np.ones(len(row_codes)), (row_codes, col_codes)),
+            shape=shape).tocsr()
+
+    def row_counts(self) -> np.ndarray:
+        return np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def col_counts(self) -> np.ndarray:
+        return np.asarray(self.matrix.sum(axis=0)).ravel()
+
+    @staticmethod
+    def top(counts, k:int) -> np.ndarray:
+        '''
+        positions of the k largest counts in descending order,
+        ties are ordered by position
+        '''
+        counts = np.asarray(counts)
+        if k >= len(counts):
+            candidates = np.arange(len(counts))
+        else:
+            part = np.argpartition(-counts, k - 1)[:k]
+            candidates = np.flatnonzero(counts >= counts[part].min())
+        order = np.lexsort((candidates, -counts[candidates]))
+        return candidates[order][:k]
+
+    def top_block(self, num_row:int=10, num_col:int=10) -> pd.DataFrame:
+        '''
+        dense counts of the top rows and top columns
+        '''
+        rows = self.top(self.row_counts(), num_row)
+        cols = self.top(self.col_counts(), num_col)
+        block = self.matrix[rows][:, cols].toarray()
+        return pd.DataFrame(block,
+            index=pd.Index(self.row_keys[rows], name=self.row_name),
+            columns=pd.Index(self.col_keys[cols], name=self.col_name))
@@ -0,0 +1,184 @@
+'''
+violin plots drawn from precomputed density curves
+'''
+import numpy as np
+import pandas as pd
+import matplotlib as mpl
+from scipy.signal import fftconvolve
+
+
+class ViolinKDE:
+    '''
+    density of every category is estimated once by linear binning and FFT
+    convolution with a gaussian kernel, so the cost of the KDE is O(n) for
+    binning plus O(bins log bins), not O(n * gridsize) like sns.violinplot().
+    bandwidth (scott), cut and the drawing follow sns.violinplot()
+    '''
+    # points of the binning grid
+    bins = 1024
+
+    @staticmethod
+    def kde(values, gridsize:int=100, cut:float=2, bins:int=None) -> tuple:
+        '''
+        support and density of values, (None, None) if singular
+        '''
+        bins = bins or ViolinKDE.bins
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if n < 2 or values.std() == 0:
+            return None, None
+        bw = values.std(ddof=1) * n ** (-1/5)
+        lo, hi = values.min() - cut * bw, values.max() + cut * bw
+        grid = np.linspace(lo, hi, bins)
+        d = grid[1] - grid[0]
+
+        # linear binning: every value is split between its two grid points
+        pos = (values - lo) / d
+        i = np.minimum(np.floor(pos).astype(np.int64), bins - 2)
+        frac = pos - i
+        counts = np.bincount(i, 1 - frac, bins) + np.bincount(i + 1, frac, bins)
+
+        # kernel truncated at 5 bandwidths
+        half = min(bins - 1, int(np.ceil(5 * bw / d)))
+        offsets = np.arange(-half, half + 1) * d
+        kernel = np.exp(-.5 * (offsets / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+        density = np.maximum(fftconvolve(counts, kernel, mode='same'), 0) / n
+        support = np.linspace(lo, hi, gridsize)
+        return support, np.interp(support, grid, density)
+
+    @staticmethod
+    def order(s:pd.Series) -> list:
+        '''
+        order of categories like seaborn
+        '''
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            return list(s.cat.categories)
+        if pd.api.types.is_numeric_dtype(s):
+            return sorted(s.dropna().unique())
+        return list(s.dropna().unique())
+
+    @staticmethod
+    def curves(df:pd.DataFrame, cat:str, val:str, log_scale:bool=False,
+            gridsize:int=100, max_sticks:int=2000) -> list:
+        '''
+        one dict per category: density curve, quartiles, box statistics and
+        sticks, values are log10 if log_scale
+        '''
+        res = []
+        for name in ViolinKDE.order(df[cat]):
+            values = df.loc[df[cat] == name, val].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if log_scale:
+                values = np.log10(values)
+            if len(values) == 0:
+                continue
+            support, density = ViolinKDE.kde(values, gridsize)
+            q1, med, q3 = np.percentile(values, [25, 50, 75])
+            iqr = q3 - q1
+            whislo = values[values >= q1 - 1.5 * iqr].min()
+            whishi = values[values <= q3 + 1.5 * iqr].max()
+            # one stick per distinct value, or evenly spaced quantiles
+            sticks = np.unique(values)
+            if len(sticks) > max_sticks:
+                sticks = np.quantile(values, np.linspace(0, 1, max_sticks))
+            res.append({'name': name, 'n': len(values), 'mean': values.mean(),
+                'support': support, 'density': density,
+                'quartiles': np.array([q1, med, q3]),
+                'box': (whislo, q1, med, q3, whishi), 'sticks': sticks})
+        return res
+
+    @staticmethod
+    def draw(ax, curves:list, orient:str='x', log_scale:bool=False, inner:str='box',
+            color:str='black', fill:bool=True, split:bool=False, width:float=.8,
+            linewidth:float=None):
+        '''
+        orient: 'x' categories on the x axis, 'y' on the y axis
+        inner: 'box', 'quart', 'stick' or None
+        '''
+        if linewidth is None:
+            linewidth = mpl.rcParams['lines.linewidth'] * (.5 if fill else 1)
+        inv = (lambda v: 10 ** np.asarray(v)) if log_scale else np.asarray
+        face = color if fill else 'none'
+        densities = [c['density'].max() for c in curves if c['density'] is not None]
+        max_density = max(densities) if densities else 1
+        hw = width / 2
+
+        def segment(pos, val):
+            # (x, y) of points at category positions and values
+            return (pos, inv(val)) if orient == 'x' else (inv(val), pos)
+
+        for i, c in enumerate(curves):
+            if c['density'] is None:
+                x, y = segment([i - hw, i + hw], [c['mean'], c['mean']])
+                ax.plot(x, y, color=color, linewidth=linewidth)
+                continue
+            span = c['density'] / max_density * hw * (2 if split else 1)
+            lower, upper = (i - (span - hw), i + hw) if split else (i - span, i + span)
+            fill_func = ax.fill_betweenx if orient == 'x' else ax.fill_between
+            fill_func(inv(c['support']), lower, upper, facecolor=face,
+                edgecolor=color, linewidth=linewidth)
+
+            support = c['support']
+            if inner == 'quart':
+                stats = c['quartiles']
+                pos0 = np.interp(stats, support, np.broadcast_to(lower, support.shape))
+                pos1 = np.interp(stats, support, np.broadcast_to(upper, support.shape))
+                dashes = [(1.25, .75), (2.5, 1), (1.25, .75)]
+                for j in range(3):
+                    x, y = segment([pos0[j], pos1[j]], [stats[j], stats[j]])
+                    ax.plot(x, y, color=color, linewidth=linewidth, dashes=dashes[j])
+            elif inner == 'stick':
+                sticks = c['sticks']
+                pos0 = np.interp(sticks, support, np.broadcast_to(lower, support.shape))
+                pos1 = np.interp(sticks, support, np.broadcast_to(upper, support.shape))
+                x0, y0 = segment(pos0, sticks)
+                x1, y1 = segment(pos1, sticks)
+                segments = np.stack([np.column_stack([x0, y0]), np.column_stack([x1, y1])], axis=1)
+                ax.add_collection(mpl.collections.LineCollection(segments,
+                    color=color, linewidth=linewidth / 2), autolim=False)
+            elif inner == 'box':
+                whislo, q1, med, q3, whishi = c['box']
+                box_width = linewidth * 4.5
+                x, y = segment([i, i], [whislo, whishi])
+                ax.plot(x, y, color=color, linewidth=box_width / 3)
+                x, y = segment([i, i], [q1, q3])
+                ax.plot(x, y, color=color, linewidth=box_width)
+                x, y = segment([i], [med])
+                ax.plot(x, y, marker='_' if orient == 'x' else '|', color=color,
+                    markersize=box_width / 1.2, markeredgewidth=box_width / 5,
+                    markeredgecolor='w', markerfacecolor='w')
+
+        # categorical axis like seaborn
+        ticks, labels = range(len(curves)), [str(c['name']) for c in curves]
+        if orient == 'x':
+            ax.set_xticks(ticks, labels)
+            ax.set_xlim(-.5, len(curves) - .5)
+            if log_scale:
+                ax.set_yscale('log')
+        else:
+            ax.set_yticks(ticks, labels)
+            ax.set_ylim(len(curves) - .5, -.5)
+            if log_scale:
+                ax.set_xscale('log')
+        return ax
+
+    @staticmethod
+    def violinplot(df:pd.DataFrame, x:str, y:str, ax, log_scale:bool=False,
+            inner:str='box', color:str='black', fill:bool=True, split:bool=False,
+            cache=None, gridsize:int=100):
+        '''
+        arguments like sns.violinplot(). categories are on the axis of the
+        non-numeric column. cache: PanelCache of the curves
+        '''
+        orient = 'x' if pd.api.types.is_numeric_dtype(df[y]) and \
+            not pd.api.types.is_numeric_dtype(df[x]) else 'y'
+        cat, val = (x, y) if orient == 'x' else (y, x)
+        params = {'cat': cat, 'val': val, 'log_scale': log_scale, 'gridsize': gridsize}
+        func = lambda: ViolinKDE.curves(df, cat, val, log_scale, gridsize)
+        curves = func() if cache is None else \
+            cache.compute('ViolinKDE.curves', df[[cat, val]], params, func)
+        ViolinKDE.draw(ax, curves, orient, log_scale, inner, color, fill, split)
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+        return ax
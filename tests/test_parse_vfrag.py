@@ -0,0 +1,39 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from parse_vfrag import ParseVfrag
+
+
+regions = pd.DataFrame({
+    'region_name': ['FR1', 'CDR1', 'FR2'],
+    'seq_from': [1, 4, 7],
+    'seq_to': [3, 6, 9],
+})
+
+
+def test_default_index_is_positions():
+    # residue 1 is the first distance, regions are 1-based and inclusive
+    dist = pd.Series([5, 20, 30, 1, 8, 9, 3, 40, 50], dtype=float)
+    stat = ParseVfrag.summarize(regions, dist, cutoff=10)
+    assert list(stat['num_residues']) == [3, 3, 3]
+    assert list(stat['min_dist']) == [5, 1, 3]
+    assert np.allclose(stat['mean_dist'], [55/3, 6, 31])
+    assert list(stat['num_contacts']) == [1, 3, 1]
+
+
+def test_integer_index_is_residue_numbers():
+    dist = pd.Series([5, 20, 30, 1], index=[3, 4, 5, 8], dtype=float)
+    stat = ParseVfrag.summarize(regions, dist, cutoff=10)
+    assert list(stat['num_residues']) == [1, 2, 1]
+    assert list(stat['min_dist']) == [5, 20, 1]
+
+
+def test_nan_stays_in_its_region():
+    dist = pd.Series([5, 20, 30, np.nan, 8, 9, 3, 40, 50])
+    stat = ParseVfrag.summarize(regions, dist, cutoff=10)
+    assert list(stat['num_residues']) == [3, 3, 3]
+    assert np.allclose(stat['mean_dist'], [55/3, 8.5, 31])
+    assert list(stat['min_dist']) == [5, 8, 3]